@@ -53,18 +53,41 @@ class FootballBets {
     return points;
   }
 
-  async getLeaderboard() {
-    const points = await this.client.readContract({
+  async getLeaderboard(offset = 0, limit = 20) {
+    const leaderboard = await this.client.readContract({
       address: this.contractAddress,
-      functionName: "get_points",
-      args: [],
+      functionName: "get_leaderboard",
+      args: [offset, limit],
+    });
+    return leaderboard.map((entry) => ({
+      rank: Number(entry.get("rank")),
+      address: entry.get("address"),
+      points: Number(entry.get("points")),
+    }));
+  }
+
+  async getPlayerRank(address) {
+    if (!address) {
+      return 0;
+    }
+    const rank = await this.client.readContract({
+      address: this.contractAddress,
+      functionName: "get_player_rank",
+      args: [address],
     });
-    return Array.from(points.entries())
-      .map(([address, points]) => ({
-        address,
-        points: Number(points),
-      }))
-      .sort((a, b) => b.points - a.points);
+    return Number(rank);
+  }
+
+  async getPlayerBets(address, offset = 0, limit = 20) {
+    const bets = await this.client.readContract({
+      address: this.contractAddress,
+      functionName: "get_player_bets",
+      args: [address, offset, limit],
+    });
+    return bets.map((betData) => ({
+      ...Object.fromEntries(betData.entries()),
+      owner: address,
+    }));
   }
 
   async createBet(gameDate, team1, team2, predictedWinner) {
@@ -95,6 +118,21 @@ class FootballBets {
     });
     return receipt;
   }
+
+  async resolveFixture(gameDate, team1, team2) {
+    const txHash = await this.client.writeContract({
+      address: this.contractAddress,
+      functionName: "resolve_fixture",
+      args: [gameDate, team1, team2],
+    });
+    const receipt = await this.client.waitForTransactionReceipt({
+      hash: txHash,
+      status: "FINALIZED",
+      interval: 10000,
+      retries: 20,
+    });
+    return receipt;
+  }
 }
 
 export default FootballBets;
@@ -50,6 +50,20 @@ export const GenLayerClient = {
     return result;
   },
 
+  async analyzeMarket(marketId) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "analyze_market",
+      args: [marketId]
+    });
+    return result;
+  },
+
   async placeBet(marketId, outcomeId, amount) {
     const currentClient = createClient({ 
       chain: studionet, 
@@ -65,6 +79,22 @@ export const GenLayerClient = {
     return result;
   },
 
+  async placeBets(legs) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const total = legs.reduce((sum, leg) => sum + BigInt(leg.amount), 0n);
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "place_bets",
+      args: [legs.map(leg => ({ ...leg, amount: BigInt(leg.amount).toString() }))],
+      value: total
+    });
+    return result;
+  },
+
   async resolveMarket(marketId) {
     const currentClient = createClient({ 
       chain: studionet, 
@@ -79,6 +109,76 @@ export const GenLayerClient = {
     return result;
   },
 
+  async claimWinnings(marketId) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "claim_winnings",
+      args: [marketId]
+    });
+    return result;
+  },
+
+  async sellShares(marketId, outcomeId, shares) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "sell_shares",
+      args: [marketId, outcomeId, BigInt(shares).toString()]
+    });
+    return result;
+  },
+
+  async placeLimitOrder(marketId, outcomeId, shares, price) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "place_limit_order",
+      args: [marketId, outcomeId, BigInt(shares).toString(), BigInt(price).toString()]
+    });
+    return result;
+  },
+
+  async cancelOrder(orderId) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "cancel_order",
+      args: [orderId]
+    });
+    return result;
+  },
+
+  async resolveMarkets(marketIds) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.writeContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "resolve_markets",
+      args: [marketIds]
+    });
+    return result;
+  },
+
   async withdrawBalance() {
     const currentClient = createClient({ 
       chain: studionet, 
@@ -93,7 +193,7 @@ export const GenLayerClient = {
     return result;
   },
 
-  async getMarkets(category = "", status = "") {
+  async getMarkets(category = "", status = "", cursor = 0, limit = 0) {
     const currentClient = createClient({ 
       chain: studionet, 
       account: account || createAccount() 
@@ -102,11 +202,81 @@ export const GenLayerClient = {
     const result = await currentClient.readContract({
       address: CONTRACT_ADDRESS,
       functionName: "get_markets",
+      args: [category, status, cursor, limit]
+    });
+    return result;
+  },
+
+  async getMarketCount(category = "", status = "") {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.readContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "get_market_count",
       args: [category, status]
     });
     return result;
   },
 
+  async getMarketSummaries(marketIds = [], fields = [], category = "", status = "", cursor = 0, limit = 20) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.readContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "get_market_summaries",
+      args: [marketIds, fields, category, status, cursor, limit]
+    });
+    return result;
+  },
+
+  async getChangesSince(version = 0, limit = 100) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.readContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "get_changes_since",
+      args: [version, limit]
+    });
+    return result;
+  },
+
+  async getPriceCandles(marketId, outcomeId, resolution = "1h", limit = 24) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.readContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "get_price_candles",
+      args: [marketId, outcomeId, resolution, limit]
+    });
+    return result;
+  },
+
+  async getOrderBook(marketId, outcomeId, limit = 10) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.readContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "get_order_book",
+      args: [marketId, outcomeId, limit]
+    });
+    return result;
+  },
+
   async getMarket(marketId) {
     const currentClient = createClient({ 
       chain: studionet, 
@@ -135,6 +305,20 @@ export const GenLayerClient = {
     return result;
   },
 
+  async getPortfolio(userAddress = "", status = "", cursor = 0, limit = 20) {
+    const currentClient = createClient({ 
+      chain: studionet, 
+      account: account || createAccount() 
+    });
+    
+    const result = await currentClient.readContract({
+      address: CONTRACT_ADDRESS,
+      functionName: "get_portfolio",
+      args: [userAddress, status, cursor, limit]
+    });
+    return result;
+  },
+
   async getUserBalance(userAddress = "") {
     const currentClient = createClient({ 
       chain: studionet, 
@@ -149,7 +333,7 @@ export const GenLayerClient = {
     return result;
   },
 
-  async getTrendingMarkets() {
+  async getTrendingMarkets(limit = 10, category = "") {
     const currentClient = createClient({ 
       chain: studionet, 
       account: account || createAccount() 
@@ -158,7 +342,7 @@ export const GenLayerClient = {
     const result = await currentClient.readContract({
       address: CONTRACT_ADDRESS,
       functionName: "get_trending_markets",
-      args: []
+      args: [limit, category]
     });
     return result;
   },
@@ -0,0 +1,146 @@
+# Runs the benchmark scenarios, prints scaling curves and compares them with a JSON baseline.
+#
+#     python -m benchmarks.run                  # full sizes, compared with benchmarks/baseline.json
+#     python -m benchmarks.run --quick          # smaller sizes for a fast check
+#     python -m benchmarks.run --save-baseline  # record the current results as the baseline
+#     python -m benchmarks.run --quick --storage  # storage reads, writes and bytes per contract method
+#
+# A result is flagged when its scaling exponent, over the sizes it shares with the baseline, grows
+# by more than --slope-tolerance. The exponent is machine independent, so it catches an O(1) path
+# turning O(n) on hardware unlike the one that recorded the baseline. Absolute timings are only
+# compared with --tolerance, on the machine that recorded the baseline: a size is then also flagged
+# when it is slower by more than that fraction (and by more than a small absolute noise floor).
+# The exit status is 1 if anything is flagged.
+
+import argparse
+import json
+import math
+import sys
+import typing
+from pathlib import Path
+
+from emulator import accounting
+
+from .scenarios import SCENARIOS
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+NOISE_FLOOR_SECONDS = 0.0002
+
+
+def scaling_exponent(timings: typing.Dict[int, float]) -> float:
+    """Least-squares slope of log(time) against log(size): ~0 for O(1), ~1 for O(n)"""
+    points = [(math.log(size), math.log(seconds)) for size, seconds in timings.items() if seconds > 0]
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def run(quick: bool, repeats: int, only: typing.List[str]) -> dict:
+    results = {}
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only:
+            continue
+        timings = {}
+        for size in scenario.quick_sizes if quick else scenario.sizes:
+            timings[size] = scenario.run(size, repeats)
+            print(f"  {scenario.name:<22} {scenario.parameter}={size:<7} {timings[size] * 1000:9.3f} ms", flush=True)
+        results[scenario.name] = {
+            "parameter": scenario.parameter,
+            "seconds": {str(size): round(seconds, 7) for size, seconds in timings.items()},
+            "exponent": round(scaling_exponent(timings), 3),
+        }
+    return results
+
+
+def print_report(results: dict) -> None:
+    print()
+    print(f"{'entry point':<22} {'scales with':<10} {'exponent':>8}   ms per call by size")
+    for name, result in results.items():
+        curve = ", ".join(f"{size}: {seconds * 1000:.3f}" for size, seconds in result["seconds"].items())
+        print(f"{name:<22} {result['parameter']:<10} {result['exponent']:>8.2f}   {curve}")
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: typing.Optional[float], slope_tolerance: float
+) -> typing.List[str]:
+    """Regressions against the baseline; absolute timings are only compared when `tolerance` is given"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if tolerance is not None:
+            for size, seconds in result["seconds"].items():
+                base = expected["seconds"].get(size)
+                if base is not None and seconds > base * (1 + tolerance) and seconds - base > NOISE_FLOOR_SECONDS:
+                    regressions.append(
+                        f"{name} at {result['parameter']}={size}: {seconds * 1000:.3f} ms vs {base * 1000:.3f} ms baseline"
+                    )
+
+        # Exponents are only comparable over the same sizes, so both are fitted to the shared ones
+        shared = [size for size in result["seconds"] if size in expected["seconds"]]
+        if len(shared) < 2:
+            continue
+        exponent = scaling_exponent({int(size): result["seconds"][size] for size in shared})
+        expected_exponent = scaling_exponent({int(size): expected["seconds"][size] for size in shared})
+        if exponent > expected_exponent + slope_tolerance:
+            regressions.append(
+                f"{name} scales as {result['parameter']}^{exponent:.2f}, baseline {result['parameter']}^{expected_exponent:.2f}"
+            )
+    return regressions
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PredictionMarket hot paths on the in-process emulator")
+    parser.add_argument("--quick", action="store_true", help="use the smaller sizes of each scenario")
+    parser.add_argument("--repeats", type=int, default=5, help="timed calls per size; the median is reported")
+    parser.add_argument("--scenario", action="append", default=[], help="run only this scenario (repeatable)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument(
+        "--tolerance", type=float, default=None,
+        help="also flag sizes slower than the baseline by more than this fraction (off by default, as timings are machine specific)",
+    )
+    parser.add_argument("--slope-tolerance", type=float, default=0.3, help="allowed growth of a scaling exponent")
+    parser.add_argument("--storage", action="store_true", help="report storage accesses per method instead of comparing timings")
+    args = parser.parse_args(argv)
+
+    if args.storage:
+        # Counting slows every call, so these timings are not compared with the baseline
+        with accounting.measure() as stats:
+            run(args.quick, args.repeats, args.scenario)
+        print()
+        print(stats.report())
+        return 0
+
+    results = run(args.quick, args.repeats, args.scenario)
+    print_report(results)
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance, args.slope_tolerance)
+    print()
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
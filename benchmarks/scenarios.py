@@ -0,0 +1,144 @@
+# Benchmark scenarios for the PredictionMarket hot paths, run on the in-process emulator.
+# Each scenario seeds synthetic state of a given size through the contract's own methods and
+# returns the seconds one call of the measured entry point takes.
+
+import json
+import statistics
+import time
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+from emulator import Address, Emulator
+
+
+CONTRACT_PATH = Path(__file__).resolve().parent.parent / "contracts" / "prediction_market.py"
+CATEGORIES = ["sports", "politics", "entertainment", "economics", "crypto", "other"]
+STAKE = 10 ** 16  # 0.01 ETH, the default minimum stake
+
+
+@dataclass
+class Scenario:
+    name: str
+    parameter: str  # What the size counts
+    sizes: typing.List[int]
+    quick_sizes: typing.List[int]
+    run: typing.Callable[[int, int], float]  # (size, repeats) -> seconds per call
+
+
+def _user(number: int) -> Address:
+    return Address(number.to_bytes(20, "big"))
+
+
+def _emulator() -> Emulator:
+    # Every market resolves to its first outcome
+    return Emulator(
+        prompt_handler=lambda prompt: json.dumps({"resolved_outcome_id": "outcome_1"}),
+        webpage_handler=lambda url, mode: "",
+        sender=_user(1),
+    )
+
+
+def _create_markets(emulator: Emulator, contract, count: int, outcomes: int = 2) -> typing.List[str]:
+    return [
+        emulator.call(
+            contract, "create_market",
+            f"Benchmark market {i}", "Synthetic market", CATEGORIES[i % len(CATEGORIES)],
+            "2030-01-01", "https://example.com/results", [f"Outcome {j}" for j in range(outcomes)],
+        )
+        for i in range(count)
+    ]
+
+
+def _median_seconds(call: typing.Callable[[int], None], repeats: int) -> float:
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def place_bet_by_users(users: int, repeats: int) -> float:
+    """A bet by a new user on a market that already has `users` bettors"""
+    emulator = _emulator()
+    contract = emulator.deploy(CONTRACT_PATH)
+    market_id = _create_markets(emulator, contract, 1)[0]
+    for i in range(users):
+        emulator.call(contract, "place_bet", market_id, f"outcome_{i % 2 + 1}", sender=_user(i + 2), value=STAKE)
+
+    return _median_seconds(
+        lambda i: emulator.call(contract, "place_bet", market_id, "outcome_1", sender=_user(users + i + 2), value=STAKE),
+        repeats,
+    )
+
+
+def place_bet_by_outcomes(outcomes: int, repeats: int) -> float:
+    """A bet on a constant-product market with `outcomes` outcomes"""
+    emulator = _emulator()
+    contract = emulator.deploy(CONTRACT_PATH)
+    market_id = emulator.call(
+        contract, "create_market",
+        "Benchmark market", "Synthetic market", "other", "2030-01-01", "https://example.com/results",
+        [f"Outcome {j}" for j in range(outcomes)], "0.01", "push", "cpmm",
+    )
+    return _median_seconds(
+        lambda i: emulator.call(contract, "place_bet", market_id, f"outcome_{i % outcomes + 1}", sender=_user(i + 2), value=STAKE),
+        repeats,
+    )
+
+
+def resolve_market_by_winners(winners: int, repeats: int) -> float:
+    """resolve_market on a push-settled market whose `winners` bettors are all paid by _distribute_winnings"""
+    # A market resolves only once and seeding dominates at large sizes, so this is a single timing
+    emulator = _emulator()
+    contract = emulator.deploy(CONTRACT_PATH)
+    market_id = _create_markets(emulator, contract, 1)[0]
+    for i in range(winners):
+        emulator.call(contract, "place_bet", market_id, "outcome_1", sender=_user(i + 2), value=STAKE)
+
+    return _median_seconds(lambda i: emulator.call(contract, "resolve_market", market_id), 1)
+
+
+def _markets_with_volume(markets: int) -> typing.Tuple[Emulator, object]:
+    emulator = _emulator()
+    contract = emulator.deploy(CONTRACT_PATH)
+    for i, market_id in enumerate(_create_markets(emulator, contract, markets)):
+        emulator.call(contract, "place_bet", market_id, "outcome_1", sender=_user(2), value=STAKE * (i % 100 + 1))
+    return emulator, contract
+
+
+def get_markets_page_by_markets(markets: int, repeats: int) -> float:
+    """One 20-market page of a category filter"""
+    emulator, contract = _markets_with_volume(markets)
+    return _median_seconds(lambda i: emulator.call(contract, "get_markets", "sports", "active", 0, 20), repeats)
+
+
+def get_markets_all_by_markets(markets: int, repeats: int) -> float:
+    """The unpaginated listing of every market"""
+    emulator, contract = _markets_with_volume(markets)
+    return _median_seconds(lambda i: emulator.call(contract, "get_markets"), repeats)
+
+
+def get_trending_markets_by_markets(markets: int, repeats: int) -> float:
+    """The top 10 markets by volume"""
+    emulator, contract = _markets_with_volume(markets)
+    return _median_seconds(lambda i: emulator.call(contract, "get_trending_markets", 10), repeats)
+
+
+def get_user_positions_by_markets(markets: int, repeats: int) -> float:
+    """Every position of a user who bet on `markets` markets"""
+    emulator, contract = _markets_with_volume(markets)
+    user = _user(2).as_hex
+    return _median_seconds(lambda i: emulator.call(contract, "get_user_positions", user), repeats)
+
+
+SCENARIOS = [
+    Scenario("place_bet", "users", [10, 1000, 10000, 100000], [10, 100, 1000], place_bet_by_users),
+    Scenario("place_bet_cpmm", "outcomes", [2, 5, 10], [2, 10], place_bet_by_outcomes),
+    Scenario("resolve_market_push", "winners", [10, 1000, 10000, 100000], [10, 100, 1000], resolve_market_by_winners),
+    Scenario("get_markets_page", "markets", [10, 100, 1000, 10000], [10, 100, 1000], get_markets_page_by_markets),
+    Scenario("get_markets_all", "markets", [10, 100, 1000, 10000], [10, 100, 1000], get_markets_all_by_markets),
+    Scenario("get_trending_markets", "markets", [10, 100, 1000, 10000], [10, 100, 1000], get_trending_markets_by_markets),
+    Scenario("get_user_positions", "markets", [10, 100, 1000, 10000], [10, 100, 1000], get_user_positions_by_markets),
+]
@@ -0,0 +1,57 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# The repository root is a package, so make the emulator importable from the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--emulator",
+        action="store_true",
+        default=False,
+        help="Run the gltest suites against the in-process emulator instead of a GenLayer node",
+    )
+    parser.addoption(
+        "--storage-report",
+        action="store_true",
+        default=False,
+        help="With --emulator, report storage reads, writes and bytes per contract method",
+    )
+
+
+def _canned_prompt(prompt: str) -> str:
+    # Deterministic stand-in answers for the AI calls the suites make
+    if "resolved_outcome_id" in prompt:
+        return json.dumps({"resolved_outcome_id": "outcome_1", "confidence": 1.0, "reasoning": "emulated"})
+    if '"winner"' in prompt:
+        return json.dumps({"score": "1:0", "winner": 1})
+    return json.dumps({"market_metrics": {"volatility": "medium", "confidence_score": 0.5}})
+
+
+def pytest_configure(config):
+    if config.getoption("--storage-report") and not config.getoption("--emulator"):
+        raise pytest.UsageError("--storage-report needs --emulator")
+
+    if config.getoption("--emulator"):
+        from emulator import gltest_facade
+
+        gltest_facade.emulator.prompt_handler = _canned_prompt
+        gltest_facade.emulator.webpage_handler = lambda url, mode: ""
+        gltest_facade.install()
+
+    if config.getoption("--storage-report"):
+        from emulator import accounting
+
+        config._storage_accounting = accounting.enable()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    storage_accounting = getattr(config, "_storage_accounting", None)
+    if storage_accounting is not None:
+        terminalreporter.section("storage accesses per call")
+        for line in storage_accounting.report().splitlines():
+            terminalreporter.write_line(line)
@@ -1,10 +1,58 @@
 # { "Depends": "py-genlayer:test" }
 
 import json
+import re
+from datetime import datetime, timezone
 from dataclasses import dataclass
+from typing import List
 from genlayer import *
 
 
+MATCH_RETRY_SECONDS = 30 * 60  # How long a "not finished" answer is trusted before the source is checked again
+RELEVANCE_STOPWORDS = {
+    "the", "and", "for", "will", "who", "what", "which", "with", "win", "wins", "winner",
+    "vs", "than", "over", "under", "this", "that", "from", "into", "other", "more", "less",
+}
+
+
+def _extract_relevant_passages(text: str, phrases: List[str], token_budget: int, context_lines: int = 2) -> str:
+    """Keep only the lines of `text` around mentions of `phrases`, within roughly `token_budget` tokens"""
+    char_budget = token_budget * 4  # ~4 characters per token
+    terms = set()
+    for phrase in phrases:
+        for word in re.findall(r"[a-z0-9]+", phrase.lower()):
+            if len(word) >= 3 and word not in RELEVANCE_STOPWORDS:
+                terms.add(word)
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    scores = [len(terms & set(re.findall(r"[a-z0-9]+", line.lower()))) for line in lines]
+    hits = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: (-scores[i], i))
+
+    # Take the best-matching lines first, each followed by its nearest neighbours for context
+    # (scores are often split across lines), as long as they fit in the budget
+    selected = set()
+    used = 0
+    for i in hits:
+        for offset in range(context_lines + 1):
+            for j in sorted({i - offset, i + offset}):
+                if j < 0 or j >= len(lines) or j in selected or used + len(lines[j]) + 1 > char_budget:
+                    continue
+                selected.add(j)
+                used += len(lines[j]) + 1
+
+    if not selected:
+        return text[:char_budget]
+
+    passages = []
+    previous = -1
+    for j in sorted(selected):
+        if previous >= 0 and j != previous + 1:
+            passages.append("...")
+        passages.append(lines[j])
+        previous = j
+    return "\n".join(passages)
+
+
 @allow_storage
 @dataclass
 class Bet:
@@ -19,16 +67,63 @@ class Bet:
     real_score: str
 
 
+# Last known result of a fixture; finished results are final, unfinished ones expire at retry_after
+@allow_storage
+@dataclass
+class MatchResult:
+    score: str
+    winner: str  # "0" for a draw, "-1" while unresolved
+    retry_after: u256  # Unix timestamp, 0 once the match is finished
+
+
 class FootballBets(gl.Contract):
     bets: TreeMap[Address, TreeMap[str, Bet]]
     points: TreeMap[Address, u256]
+    # Players with points, highest first; players with equal points form one contiguous group,
+    # which starts at ranking_group_starts[points] and holds ranking_group_sizes[points] players
+    ranking: DynArray[Address]
+    ranking_slots: TreeMap[Address, u256]
+    ranking_group_starts: TreeMap[u256, u256]
+    ranking_group_sizes: TreeMap[u256, u256]
+    # Bet ids per player in creation order, for paging through a player's bets
+    bet_ids: TreeMap[Address, DynArray[str]]
+    # Match results per fixture id, so a fixture is only checked again while it is unfinished
+    match_results: TreeMap[str, MatchResult]
+    # Players with a bet on each fixture, keyed like bet ids: "{game_date}_{team1}_{team2}" lowercased
+    fixture_bettors: TreeMap[str, DynArray[Address]]
+    # Approximate prompt tokens of the fetched results page kept per match check
+    resolution_token_budget: u256
 
-    def __init__(self):
-        pass
+    def __init__(self, resolution_token_budget: int = 2000):
+        self.resolution_token_budget = resolution_token_budget
+
+    def _now(self) -> int:
+        """Current Unix timestamp (the transaction time inside GenVM)"""
+        return int(datetime.now(timezone.utc).timestamp())
+
+    def _match_result(self, bet: Bet) -> dict:
+        """Result of a bet's fixture from the cache, checking the source only when unknown or expired"""
+        now = self._now()
+        if bet.id in self.match_results:
+            cached = self.match_results[bet.id]
+            if cached.retry_after == 0 or now < cached.retry_after:
+                return {"score": cached.score, "winner": cached.winner}
+
+        bet_status = self._check_match(bet.resolution_url, bet.team1, bet.team2)
+        finished = int(bet_status["winner"]) >= 0
+        self.match_results[bet.id] = MatchResult(
+            score=bet_status["score"],
+            winner=str(bet_status["winner"]),
+            retry_after=0 if finished else now + MATCH_RETRY_SECONDS,
+        )
+        return bet_status
 
     def _check_match(self, resolution_url: str, team1: str, team2: str) -> dict:
+        token_budget = int(self.resolution_token_budget)
+
         def get_match_result() -> str:
             web_data = gl.get_webpage(resolution_url, mode="text")
+            web_data = _extract_relevant_passages(web_data, [team1, team2], token_budget)
 
             task = f"""
 Extract the match result for:
@@ -85,26 +180,88 @@ This result should be perfectly parsable by a JSON parser without errors.
             real_score="",
         )
         self.bets.get_or_insert_default(sender_address)[bet_id] = bet
+        self.bet_ids.get_or_insert_default(sender_address).append(bet_id)
+        self.fixture_bettors.get_or_insert_default(bet_id).append(sender_address)
+
+    def _settle_bet(self, player: Address, bet: Bet, bet_status: dict) -> None:
+        bet.has_resolved = True
+        bet.real_winner = str(bet_status["winner"])
+        bet.real_score = bet_status["score"]
+
+        if bet.real_winner == bet.predicted_winner:
+            if player not in self.points:
+                self.points[player] = 0
+            self.points[player] += 1
+            self._update_ranking(player, self.points[player])
+
+    def _update_ranking(self, player: Address, points: int) -> None:
+        """Move a player who just gained a point into the next group up, in O(1)"""
+        if points == 1:
+            # New players join the lowest group at the end of the ranking
+            self.ranking.append(player)
+            slot = len(self.ranking) - 1
+            self.ranking_slots[player] = slot
+        else:
+            # Swap the player with the first member of their old group, which then starts one slot later
+            previous = points - 1
+            slot = self.ranking_group_starts[previous]
+            other = self.ranking[slot]
+            old_slot = self.ranking_slots[player]
+            self.ranking[slot], self.ranking[old_slot] = player, other
+            self.ranking_slots[player], self.ranking_slots[other] = slot, old_slot
+
+            self.ranking_group_starts[previous] = slot + 1
+            self.ranking_group_sizes[previous] -= 1
+            if self.ranking_group_sizes[previous] == 0:
+                del self.ranking_group_starts[previous]
+                del self.ranking_group_sizes[previous]
+
+        # The new group sits right above the old one, so the player's slot is its last slot
+        if points not in self.ranking_group_sizes:
+            self.ranking_group_starts[points] = slot
+            self.ranking_group_sizes[points] = 0
+        self.ranking_group_sizes[points] += 1
 
     @gl.public.write
-    def resolve_bet(self, bet_id: str) -> None:
+    def resolve_bet(self, bet_id: str) -> bool:
+        """Settle the caller's bet, returning False (and leaving it open) if the game is not finished"""
         if self.bets[gl.message.sender_address][bet_id].has_resolved:
             raise Exception("Bet already resolved")
 
         bet = self.bets[gl.message.sender_address][bet_id]
-        bet_status = self._check_match(bet.resolution_url, bet.team1, bet.team2)
+        bet_status = self._match_result(bet)
 
+        # Not raising here keeps the cached "not finished" answer
         if int(bet_status["winner"]) < 0:
-            raise Exception("Game not finished")
+            return False
 
-        bet.has_resolved = True
-        bet.real_winner = str(bet_status["winner"])
-        bet.real_score = bet_status["score"]
+        self._settle_bet(gl.message.sender_address, bet, bet_status)
+        return True
 
-        if bet.real_winner == bet.predicted_winner:
-            if gl.message.sender_address not in self.points:
-                self.points[gl.message.sender_address] = 0
-            self.points[gl.message.sender_address] += 1
+    @gl.public.write
+    def resolve_fixture(self, game_date: str, team1: str, team2: str) -> int:
+        """Check a match once and settle every open bet on it, returning how many were settled (0 if not finished)"""
+        fixture_id = f"{game_date}_{team1}_{team2}".lower()
+        if fixture_id not in self.fixture_bettors:
+            raise Exception("No bets on this fixture")
+
+        players = self.fixture_bettors[fixture_id]
+        open_bets = []
+        for player in players:
+            bet = self.bets[player][fixture_id]
+            if not bet.has_resolved:
+                open_bets.append((player, bet))
+        if not open_bets:
+            raise Exception("Fixture already resolved")
+
+        bet_status = self._match_result(open_bets[0][1])
+
+        if int(bet_status["winner"]) < 0:
+            return 0
+
+        for player, bet in open_bets:
+            self._settle_bet(player, bet, bet_status)
+        return len(open_bets)
 
     @gl.public.view
     def get_bets(self) -> dict:
@@ -117,3 +274,35 @@ This result should be perfectly parsable by a JSON parser without errors.
     @gl.public.view
     def get_player_points(self, player_address: str) -> int:
         return self.points.get(Address(player_address), 0)
+
+    @gl.public.view
+    def get_player_bets(self, player_address: str, offset: int = 0, limit: int = 20) -> List[Bet]:
+        player = Address(player_address)
+        if player not in self.bet_ids:
+            return []
+
+        bet_ids = self.bet_ids[player]
+        bets = self.bets[player]
+        return [bets[bet_ids[i]] for i in range(offset, min(offset + limit, len(bet_ids)))]
+
+    @gl.public.view
+    def get_leaderboard(self, offset: int = 0, limit: int = 20) -> List[dict]:
+        leaderboard = []
+        for i in range(offset, min(offset + limit, len(self.ranking))):
+            player = self.ranking[i]
+            points = self.points[player]
+            # Tied players share the rank of their group
+            leaderboard.append({
+                "rank": self.ranking_group_starts[points] + 1,
+                "address": player.as_hex,
+                "points": points,
+            })
+        return leaderboard
+
+    @gl.public.view
+    def get_player_rank(self, player_address: str) -> int:
+        """1-based rank of a player by points, or 0 if they have no points yet"""
+        player = Address(player_address)
+        if player not in self.points:
+            return 0
+        return self.ranking_group_starts[self.points[player]] + 1
@@ -1,25 +1,88 @@
 # { "Depends": "py-genlayer:test" }
 
+import hashlib
 import json
 import re
+from datetime import datetime, timezone
 from dataclasses import dataclass
 from typing import List, Dict, Optional
 from genlayer import *
 
 
-@allow_storage
-@dataclass
-class MarketOutcome:
-    id: str
-    description: str
-    total_stakes: u256
-    share_price: u256  # Current price per share (in wei)
+CATEGORIES = ["sports", "politics", "entertainment", "economics", "crypto", "other"]
+MARKET_STATUSES = ["active", "resolved", "cancelled"]
+SETTLEMENT_MODES = ["push", "claim"]  # push: pay winners on resolution, claim: winners pull payouts
+MAX_OUTCOMES = 10
+PAYOUT_RATIO_SCALE = 1000000000000000000  # payout_ratio is wei paid per wei staked, scaled by 1e18
+PRICING_MODELS = ["linear", "cpmm"]  # linear: legacy stake-ratio AMM, cpmm: integer constant-product AMM
+WEI_PER_ETH = 1000000000000000000
+# Columns get_market_summaries can project; market metadata is only loaded for COLD_SUMMARY_FIELDS
+SUMMARY_FIELDS = [
+    "id", "title", "category", "status", "total_volume", "outcome_count", "prices", "top_outcomes",
+    "description", "creator", "creation_date", "resolution_date", "outcome_descriptions",
+]
+COLD_SUMMARY_FIELDS = ["description", "creator", "creation_date", "resolution_date", "outcome_descriptions"]
+DEFAULT_SUMMARY_FIELDS = ["id", "title", "category", "total_volume", "top_outcomes"]
+ORDER_ID_SPACE = 2 ** 64  # Order book keys are price * ORDER_ID_SPACE + order number
+MAX_ORDER_FILLS = 20  # Resting orders a single bet fills at most; the rest of the bet goes to the AMM
+TRENDING_VOLUME_SPACE = 2 ** 128  # Volumes in wei stay below this; see _trending_key
+CHANGE_LOG_CAPACITY = 1000  # Most recent market changes get_changes_since can replay
+# Candle bucket sizes in seconds; each outcome keeps the last CANDLE_CAPACITY candles per resolution
+CANDLE_RESOLUTIONS = {"1h": 60 * 60, "1d": 24 * 60 * 60}
+CANDLE_CAPACITY = 168
+SENTIMENT_CACHE_TTL = 7 * 24 * 60 * 60  # Seconds a cached sentiment analysis stays reusable
+
+
+RELEVANCE_STOPWORDS = {
+    "the", "and", "for", "will", "who", "what", "which", "with", "win", "wins", "winner",
+    "vs", "than", "over", "under", "this", "that", "from", "into", "other", "more", "less",
+}
+
+
+def _extract_relevant_passages(text: str, phrases: List[str], token_budget: int, context_lines: int = 2) -> str:
+    """Keep only the lines of `text` around mentions of `phrases`, within roughly `token_budget` tokens"""
+    char_budget = token_budget * 4  # ~4 characters per token
+    terms = set()
+    for phrase in phrases:
+        for word in re.findall(r"[a-z0-9]+", phrase.lower()):
+            if len(word) >= 3 and word not in RELEVANCE_STOPWORDS:
+                terms.add(word)
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    scores = [len(terms & set(re.findall(r"[a-z0-9]+", line.lower()))) for line in lines]
+    hits = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: (-scores[i], i))
+
+    # Take the best-matching lines first, each followed by its nearest neighbours for context
+    # (scores are often split across lines), as long as they fit in the budget
+    selected = set()
+    used = 0
+    for i in hits:
+        for offset in range(context_lines + 1):
+            for j in sorted({i - offset, i + offset}):
+                if j < 0 or j >= len(lines) or j in selected or used + len(lines[j]) + 1 > char_budget:
+                    continue
+                selected.add(j)
+                used += len(lines[j]) + 1
+
+    if not selected:
+        return text[:char_budget]
 
+    passages = []
+    previous = -1
+    for j in sorted(selected):
+        if previous >= 0 and j != previous + 1:
+            passages.append("...")
+        passages.append(lines[j])
+        previous = j
+    return "\n".join(passages)
 
+
+# Markets are stored under their number N and exposed as "market_N"; outcomes are stored by
+# index i and exposed as "outcome_{i+1}". Descriptive market metadata is written at creation and
+# resolution, and loaded only when displayed or resolved.
 @allow_storage
 @dataclass
 class Market:
-    id: str
     title: str
     description: str
     category: str  # sports, politics, entertainment, economics, crypto
@@ -27,39 +90,325 @@ class Market:
     creation_date: str
     resolution_date: str
     resolution_source: str
-    status: str  # active, resolved, cancelled
-    outcomes: List[MarketOutcome]
-    total_volume: u256
-    resolved_outcome_id: str
+    outcome_descriptions: List[str]
     resolution_data: str
+    analysis_status: str  # pending, complete
+    analysis: str  # JSON sentiment analysis, empty while pending
+
+
+# Compact numeric market record holding everything bets, pricing and settlement touch
+@allow_storage
+@dataclass
+class MarketState:
+    status: u8  # Index into MARKET_STATUSES
+    category: u8  # Index into CATEGORIES
+    pricing_model: u8  # Index into PRICING_MODELS
+    settlement_mode: u8  # Index into SETTLEMENT_MODES
     min_stake: u256
+    total_volume: u256
+    total_stakes: u256  # Running sum of outcome stakes, maintained by place_bet and sell_shares
+    pot: u256  # Wei owed to winners: stakes paid in minus proceeds of shares sold back, never below total_stakes
+    payout_ratio: u256  # Set on resolution, scaled by PAYOUT_RATIO_SCALE
+    resolved_outcome: u8  # Index of the winning outcome once resolved
+    outcome_stakes: List[u256]
+    outcome_pools: List[u256]  # Constant-product reserves of outcome shares (cpmm markets only)
 
 
 @allow_storage
 @dataclass
 class UserPosition:
-    market_id: str
-    outcome_id: str
+    market_num: u256
+    outcome_index: u8
     shares: u256
     total_invested: u256
     average_price: u256
+    claimed: bool
+
+
+# A resting offer to sell shares of one outcome; the shares and their stake basis are moved out
+# of the owner's position into the order until it is filled or cancelled
+@allow_storage
+@dataclass
+class LimitOrder:
+    owner: Address
+    market_num: u256
+    outcome_index: u8
+    price: u256  # Wei per share
+    shares: u256  # Unfilled shares
+    invested: u256  # Stake basis escrowed with the unfilled shares
+
+
+# Links of one entry in a linked list kept as a TreeMap keyed by entry; key 0 is the head, whose
+# `next` is the first entry and `prev` the last. Removed entries keep their links, so a page cursor
+# left on one can still find its place in the list
+@allow_storage
+@dataclass
+class ListLink:
+    prev: u256
+    next: u256
+    removed: bool
+
+
+# One price bucket of an outcome; prices are in wei per share, volume is the wei staked on it
+@allow_storage
+@dataclass
+class Candle:
+    start: u256  # Unix timestamp of the bucket start
+    open: u256
+    high: u256
+    low: u256
+    close: u256
+    volume: u256
+
+
+@allow_storage
+@dataclass
+class SentimentCacheEntry:
+    analysis: str  # JSON sentiment analysis
+    expires_at: u256  # Unix timestamp
 
 
 class PredictionMarket(gl.Contract):
-    markets: TreeMap[str, Market]
-    user_positions: TreeMap[Address, TreeMap[str, UserPosition]]
+    markets: TreeMap[u256, Market]
+    market_states: TreeMap[u256, MarketState]
+    # Titles apart from the rest of the metadata, for list views that only need a name
+    market_titles: TreeMap[u256, str]
+    # Positions per user, keyed by _position_key(market number, outcome index)
+    user_positions: TreeMap[Address, TreeMap[u256, UserPosition]]
+    # Position keys per user linked in opening order, for paging through a portfolio
+    user_position_keys: TreeMap[Address, TreeMap[u256, ListLink]]
+    # Holders of each position key, so settlement only visits winners, and the slot of each holder
+    # in that list for O(1) removal
+    position_holders: TreeMap[u256, DynArray[Address]]
+    position_holder_slots: TreeMap[u256, TreeMap[Address, u256]]
     user_balances: TreeMap[Address, u256]
     market_counter: u256
+    # Market numbers per "{category}|{status}" filter (either side may be empty), linked in the
+    # order markets entered the filter, and the number of markets in each
+    market_index: TreeMap[str, TreeMap[u256, ListLink]]
+    market_index_sizes: TreeMap[str, u256]
+    # Every active market by volume, overall ("") and per category, keyed by _trending_key so the
+    # highest volume comes first; values are market numbers
+    trending: TreeMap[str, TreeMap[u256, u256]]
+    # Current _trending_key of each active market
+    trending_keys: TreeMap[u256, u256]
+    trending_capacity: u256  # Most markets get_trending_markets lists
+    # Sentiment analyses keyed by a hash of the normalized (title, description, category)
+    sentiment_cache: TreeMap[str, SentimentCacheEntry]
+    # Markets awaiting sentiment analysis, consumed from pending_analysis_head by analyze_pending
+    pending_analysis: DynArray[u256]
+    pending_analysis_head: u256
+    # Approximate prompt tokens of fetched resolution pages kept per market
+    resolution_token_budget: u256
+    # Incremented on every market change; change_log is a ring buffer of the market number touched
+    # by each of the last CHANGE_LOG_CAPACITY versions, at slot (version - 1) % CHANGE_LOG_CAPACITY
+    state_version: u256
+    change_log: DynArray[u256]
+    # Latest version that touched each market, so a market changed several times is reported once
+    market_versions: TreeMap[u256, u256]
+    # Price candles per _candle_key(position key, resolution), a ring buffer of CANDLE_CAPACITY
+    # candles at slot (candle number % CANDLE_CAPACITY); candle_counts holds candles ever written
+    price_candles: TreeMap[u256, DynArray[Candle]]
+    candle_counts: TreeMap[u256, u256]
+    # Resting sell orders by number, and per position key an order book sorted by price and then
+    # age (keys are price * ORDER_ID_SPACE + order number), so the best ask is the first key
+    orders: TreeMap[u256, LimitOrder]
+    order_books: TreeMap[u256, TreeMap[u256, u256]]
+    order_counter: u256
 
-    def __init__(self):
+    def __init__(self, trending_capacity: int = 50, resolution_token_budget: int = 2000):
         self.market_counter = 0
+        self.trending_capacity = trending_capacity
+        self.resolution_token_budget = resolution_token_budget
 
-    def _generate_market_id(self) -> str:
+    def _generate_market_num(self) -> int:
         self.market_counter += 1
-        return f"market_{self.market_counter}"
+        return self.market_counter
+
+    def _market_id(self, market_num: int) -> str:
+        return f"market_{market_num}"
+
+    def _parse_market_num(self, market_id: str) -> int:
+        """Map a "market_N" id (or a bare N) to its storage key"""
+        number = market_id[len("market_"):] if market_id.startswith("market_") else market_id
+        if not number.isdigit() or int(number) not in self.market_states:
+            raise Exception("Market not found")
+        return int(number)
+
+    def _position_key(self, market_num: int, outcome_index: int) -> u256:
+        return u256(market_num * MAX_OUTCOMES + outcome_index)
+
+    def _touch_market(self, market_num: int) -> None:
+        """Record a market change in the versioned change log"""
+        self.state_version += 1
+        if len(self.change_log) < CHANGE_LOG_CAPACITY:
+            self.change_log.append(market_num)
+        else:
+            self.change_log[(self.state_version - 1) % CHANGE_LOG_CAPACITY] = market_num
+        self.market_versions[market_num] = self.state_version
+
+    def _candle_key(self, market_num: int, outcome_index: int, resolution_index: int) -> u256:
+        return u256(self._position_key(market_num, outcome_index) * len(CANDLE_RESOLUTIONS) + resolution_index)
+
+    def _record_prices(self, market_num: int, prices_before: List[u256], prices_after: List[u256], volumes: List[int]) -> None:
+        """Fold a price move of every outcome into the current candle of each resolution"""
+        now = self._now()
+        for outcome_index in range(len(prices_after)):
+            price_before = prices_before[outcome_index]
+            price = prices_after[outcome_index]
+            for resolution_index, interval in enumerate(CANDLE_RESOLUTIONS.values()):
+                candle_key = self._candle_key(market_num, outcome_index, resolution_index)
+                candles = self.price_candles.get_or_insert_default(candle_key)
+                count = self.candle_counts.get(candle_key, u256(0))
+                bucket_start = now - now % interval
+
+                if count > 0 and candles[(count - 1) % CANDLE_CAPACITY].start == bucket_start:
+                    candle = candles[(count - 1) % CANDLE_CAPACITY]
+                    candle.high = max(candle.high, price)
+                    candle.low = min(candle.low, price)
+                    candle.close = price
+                    candle.volume += volumes[outcome_index]
+                    continue
+
+                # A new bucket opens at the price before this move and overwrites the oldest slot once full
+                candle = Candle(
+                    start=u256(bucket_start),
+                    open=price_before,
+                    high=max(price_before, price),
+                    low=min(price_before, price),
+                    close=price,
+                    volume=u256(volumes[outcome_index])
+                )
+                if len(candles) < CANDLE_CAPACITY:
+                    candles.append(candle)
+                else:
+                    candles[count % CANDLE_CAPACITY] = candle
+                self.candle_counts[candle_key] = count + 1
+
+    def _link_append(self, links: TreeMap[u256, ListLink], key: int) -> None:
+        """Append a key to a linked list"""
+        if 0 not in links:
+            links[0] = ListLink(prev=u256(0), next=u256(0), removed=False)
+        last_key = links[0].prev
+        links[key] = ListLink(prev=last_key, next=u256(0), removed=False)
+        links[last_key].next = key
+        links[0].prev = key
+
+    def _link_remove(self, links: TreeMap[u256, ListLink], key: int) -> None:
+        """Unlink a key in O(1), keeping the order of the rest of the list"""
+        link = links[key]
+        links[link.prev].next = link.next
+        links[link.next].prev = link.prev
+        link.removed = True
+
+    def _link_next(self, links: TreeMap[u256, ListLink], cursor: int) -> u256:
+        """The key following `cursor` in a linked list (0 = the start), or 0 at its end"""
+        if cursor not in links:
+            if cursor == 0:
+                return u256(0)
+            raise Exception("Invalid cursor")
+
+        # A cursor removed since it was handed out links back to the entry before it; the nearest
+        # entry still listed is followed by the first entry after the cursor
+        link = links[cursor]
+        while link.removed:
+            link = links[link.prev]
+        return link.next
+
+    def _link_page(self, links: TreeMap[u256, ListLink], cursor: int, limit: int) -> List[u256]:
+        """Up to `limit` keys (0 = no limit) following the key `cursor`, or from the start for cursor 0"""
+        keys = []
+        key = self._link_next(links, cursor)
+        while key != 0 and (limit <= 0 or len(keys) < limit):
+            keys.append(key)
+            key = links[key].next
+        return keys
+
+    def _index_add(self, index_key: str, market_num: int) -> None:
+        self._link_append(self.market_index.get_or_insert_default(index_key), market_num)
+        self.market_index_sizes[index_key] = self.market_index_sizes.get(index_key, u256(0)) + 1
+
+    def _index_remove(self, index_key: str, market_num: int) -> None:
+        self._link_remove(self.market_index[index_key], market_num)
+        self.market_index_sizes[index_key] -= 1
+
+    def _index_page(self, category: str, status: str, cursor: int, limit: int) -> List[u256]:
+        index_key = f"{category}|{status}"
+        if index_key not in self.market_index:
+            return []
+        return self._link_page(self.market_index[index_key], cursor, limit)
+
+    def _index_market(self, market_num: int, state: MarketState) -> None:
+        category, status = CATEGORIES[state.category], MARKET_STATUSES[state.status]
+        for index_key in ["|", f"{category}|", f"|{status}", f"{category}|{status}"]:
+            self._index_add(index_key, market_num)
+
+    def _set_market_status(self, market_num: int, state: MarketState, status: int) -> None:
+        """Change a market's status, moving it between the status indexes"""
+        category = CATEGORIES[state.category]
+        for index_key in [f"|{MARKET_STATUSES[state.status]}", f"{category}|{MARKET_STATUSES[state.status]}"]:
+            self._index_remove(index_key, market_num)
+        state.status = status
+        for index_key in [f"|{MARKET_STATUSES[status]}", f"{category}|{MARKET_STATUSES[status]}"]:
+            self._index_add(index_key, market_num)
+
+    def _trending_key(self, market_num: int, total_volume: int) -> u256:
+        """Volume index key: higher volumes sort first, equal volumes by market number"""
+        return u256((TRENDING_VOLUME_SPACE - 1 - total_volume) * ORDER_ID_SPACE + market_num)
+
+    def _update_trending(self, market_num: int, state: MarketState) -> None:
+        """Insert or re-key an active market in the overall and category volume indexes"""
+        key = self._trending_key(market_num, state.total_volume)
+        old_key = self.trending_keys.get(market_num)
+        if old_key == key:
+            return
+
+        for trending_key in ["", CATEGORIES[state.category]]:
+            index = self.trending.get_or_insert_default(trending_key)
+            if old_key is not None:
+                del index[old_key]
+            index[key] = market_num
+        self.trending_keys[market_num] = key
+
+    def _remove_from_trending(self, market_num: int, state: MarketState) -> None:
+        """Drop a market that is no longer active, so the next market by volume moves up"""
+        if market_num not in self.trending_keys:
+            return
+        key = self.trending_keys[market_num]
+        for trending_key in ["", CATEGORIES[state.category]]:
+            del self.trending[trending_key][key]
+        del self.trending_keys[market_num]
+
+    def _now(self) -> int:
+        """Current Unix timestamp (the transaction time inside GenVM)"""
+        return int(datetime.now(timezone.utc).timestamp())
+
+    def _sentiment_cache_key(self, title: str, description: str, category: str) -> str:
+        """Hash of the market text with case, punctuation and whitespace normalized away"""
+        # Numbers are kept: "BTC above $50k" and "BTC above $150k" are different markets
+        def normalize(text: str) -> str:
+            return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+        normalized = "\n".join([category, normalize(title), normalize(description)])
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _cached_sentiment(self, cache_key: str, now: int) -> str:
+        """Cached analysis JSON for a cache key, or an empty string if missing or expired"""
+        if cache_key in self.sentiment_cache:
+            cached = self.sentiment_cache[cache_key]
+            if cached.expires_at > now:
+                return cached.analysis
+        return ""
 
     def _calculate_market_sentiment(self, title: str, description: str, category: str) -> dict:
         """Enhanced AI-powered market sentiment analysis with category-specific intelligence"""
+        # Reuse a fresh analysis of an equivalent market instead of prompting again
+        cache_key = self._sentiment_cache_key(title, description, category)
+        now = self._now()
+        cached = self._cached_sentiment(cache_key, now)
+        if cached:
+            return json.loads(cached)
+
         def analyze_sentiment() -> str:
             # Category-specific analysis prompts
             category_prompts = {
@@ -185,15 +534,24 @@ Only return valid JSON, no additional text.
             cleaned = result.replace("```json", "").replace("```", "").strip()
             return json.dumps(json.loads(cleaned), sort_keys=True)
 
-        result_json = json.loads(gl.eq_principle_strict_eq(analyze_sentiment))
+        analysis = gl.eq_principle_strict_eq(analyze_sentiment)
+        self.sentiment_cache[cache_key] = SentimentCacheEntry(
+            analysis=analysis,
+            expires_at=u256(now + SENTIMENT_CACHE_TTL)
+        )
+        result_json = json.loads(analysis)
         return result_json
 
     def _resolve_market_with_ai(self, market: Market) -> dict:
         """AI-powered market resolution using web data and analysis"""
+        token_budget = int(self.resolution_token_budget)
+        keywords = [market.title] + list(market.outcome_descriptions)
+
         def get_resolution_data() -> str:
-            # Fetch web data if resolution source is a URL
+            # Fetch web data if resolution source is a URL, keeping only the passages about this market
             if market.resolution_source.startswith("http"):
                 web_data = gl.get_webpage(market.resolution_source, mode="text")
+                web_data = _extract_relevant_passages(web_data, keywords, token_budget)
             else:
                 web_data = market.resolution_source
 
@@ -203,7 +561,7 @@ Resolve this prediction market based on the provided data:
 Market: {market.title}
 Description: {market.description}
 Category: {market.category}
-Possible Outcomes: {[outcome.description for outcome in market.outcomes]}
+Possible Outcomes: {list(market.outcome_descriptions)}
 
 Data Source:
 {web_data}
@@ -225,13 +583,67 @@ Only return valid JSON, no additional text.
         result_json = json.loads(gl.eq_principle_strict_eq(get_resolution_data))
         return result_json
 
-    def _calculate_share_price(self, outcome: MarketOutcome, total_market_stakes: u256) -> u256:
+    def _resolve_markets_with_ai(self, markets: Dict[str, Market], resolution_source: str) -> dict:
+        """Resolve several markets sharing one resolution source with a single fetch and prompt"""
+        token_budget = int(self.resolution_token_budget) * len(markets)
+        keywords = []
+        for market in markets.values():
+            keywords.append(market.title)
+            keywords.extend(market.outcome_descriptions)
+
+        def get_resolution_data() -> str:
+            # Fetch web data once for every market in the group, keeping only the relevant passages
+            if resolution_source.startswith("http"):
+                web_data = gl.get_webpage(resolution_source, mode="text")
+                web_data = _extract_relevant_passages(web_data, keywords, token_budget)
+            else:
+                web_data = resolution_source
+
+            market_descriptions = "\n".join(
+                f"""
+Market ID: {market_id}
+Market: {market.title}
+Description: {market.description}
+Category: {market.category}
+Possible Outcomes: {", ".join(f"{self._outcome_id(i)}: {description}" for i, description in enumerate(market.outcome_descriptions))}
+"""
+                for market_id, market in markets.items()
+            )
+
+            task = f"""
+Resolve each of these prediction markets based on the provided data:
+{market_descriptions}
+Data Source:
+{web_data}
+
+Determine which outcome occurred in every market. Respond in JSON, with one entry per Market ID:
+{{
+    "markets": {{
+        "market_id": {{
+            "resolved_outcome_id": "outcome_id or null if unresolved",
+            "confidence": 0.95,
+            "resolution_summary": "Brief explanation of what happened",
+            "evidence": "Key evidence from the data supporting this resolution"
+        }}
+    }}
+}}
+
+Only return valid JSON, no additional text.
+            """
+            result = gl.exec_prompt(task)
+            cleaned = result.replace("```json", "").replace("```", "").strip()
+            return json.dumps(json.loads(cleaned), sort_keys=True)
+
+        result_json = json.loads(gl.eq_principle_strict_eq(get_resolution_data))
+        return result_json.get("markets", {})
+
+    def _calculate_share_price(self, outcome_stakes: u256, total_market_stakes: u256) -> u256:
         """Simple automated market maker - calculates share price based on current stakes"""
         if total_market_stakes == 0:
             return 500000000000000000  # 0.5 ETH initial price
         
         # Basic AMM: price increases with more stakes on this outcome
-        outcome_ratio = float(outcome.total_stakes) / float(total_market_stakes)
+        outcome_ratio = float(outcome_stakes) / float(total_market_stakes)
         base_price = 100000000000000000  # 0.1 ETH
         max_price = 900000000000000000   # 0.9 ETH
         
@@ -239,6 +651,85 @@ Only return valid JSON, no additional text.
         price = int(base_price + (outcome_ratio * (max_price - base_price)))
         return u256(price)
 
+    def _cpmm_prices(self, pools: List[u256]) -> List[u256]:
+        """Constant-product prices in wei per share; outcome i is weighted by the product of the other pools"""
+        count = len(pools)
+        # prefix[i] * suffix[i + 1] is the product of every pool except pool i
+        prefix = [1] * (count + 1)
+        suffix = [1] * (count + 1)
+        for i in range(count):
+            prefix[i + 1] = prefix[i] * pools[i]
+            suffix[count - 1 - i] = suffix[count - i] * pools[count - 1 - i]
+
+        weights = [prefix[i] * suffix[i + 1] for i in range(count)]
+        total_weight = sum(weights)
+        return [u256(weight * WEI_PER_ETH // total_weight) for weight in weights]
+
+    def _outcome_prices(self, state: MarketState) -> List[u256]:
+        """Current share price of every outcome, derived from stakes or pools on read"""
+        if PRICING_MODELS[state.pricing_model] == "cpmm":
+            return self._cpmm_prices(state.outcome_pools)
+        return [self._calculate_share_price(stakes, state.total_stakes) for stakes in state.outcome_stakes]
+
+    def _cpmm_buy(self, pools: List[u256], outcome_index: int, amount: u256) -> u256:
+        """Add `amount` to every pool, then take shares out of the bought pool so the pool product is unchanged"""
+        invariant = 1
+        others_after = 1
+        for i in range(len(pools)):
+            invariant *= pools[i]
+            if i != outcome_index:
+                pools[i] += amount
+                others_after *= pools[i]
+
+        pool_before = pools[outcome_index] + amount
+        pools[outcome_index] = u256(-(-invariant // others_after))  # Round up so rounding never favours the buyer
+        return u256(pool_before - pools[outcome_index])
+
+    def _cpmm_sell(self, pools: List[u256], outcome_index: int, shares: u256) -> u256:
+        """Return `shares` to the sold pool, then take the largest amount out of every pool that keeps the pool product"""
+        invariant = 1
+        for pool in pools:
+            invariant *= pool
+        pools[outcome_index] += shares
+
+        def product_after(amount: int) -> int:
+            product = 1
+            for pool in pools:
+                product *= pool - amount
+            return product
+
+        # The product falls as the amount grows, so binary search the largest amount that keeps it
+        low, high = 0, min(pools)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if product_after(mid) >= invariant:
+                low = mid
+            else:
+                high = mid - 1
+
+        for i in range(len(pools)):
+            pools[i] -= low
+        return u256(low)
+
+    def _outcome_id(self, outcome_index: int) -> str:
+        return f"outcome_{outcome_index + 1}"
+
+    def _parse_outcome_index(self, state: MarketState, outcome_id: str) -> int:
+        """Map an "outcome_N" id to its index without loading the market metadata"""
+        prefix, _, number = outcome_id.partition("_")
+        if prefix != "outcome" or not number.isdigit() or not 1 <= int(number) <= len(state.outcome_stakes):
+            raise Exception("Outcome not found")
+        return int(number) - 1
+
+    def _eth_to_wei(self, amount_eth: str) -> u256:
+        """Parse a decimal ETH amount into wei without a float round-trip"""
+        whole, _, fraction = amount_eth.strip().partition(".")
+        if not (whole or fraction) or not (whole or "0").isdigit() or (fraction and not fraction.isdigit()):
+            raise Exception(f"Invalid ETH amount: {amount_eth}")
+        if len(fraction) > 18:
+            raise Exception("ETH amounts support at most 18 decimals")
+        return u256(int(whole or "0") * WEI_PER_ETH + int(fraction.ljust(18, "0")))
+
     @gl.public.write
     def create_market(
         self,
@@ -248,39 +739,42 @@ Only return valid JSON, no additional text.
         resolution_date: str,
         resolution_source: str,
         outcomes: List[str],
-        min_stake_eth: str = "0.01"
+        min_stake_eth: str = "0.01",
+        settlement_mode: str = "push",
+        pricing_model: str = "linear",
+        liquidity_eth: str = "1"
     ) -> str:
         """Create a new prediction market with AI-suggested initial setup"""
         
         # Validate inputs
-        if len(outcomes) < 2 or len(outcomes) > 10:
+        if len(outcomes) < 2 or len(outcomes) > MAX_OUTCOMES:
             raise Exception("Market must have between 2 and 10 outcomes")
         
-        if category not in ["sports", "politics", "entertainment", "economics", "crypto", "other"]:
+        if category not in CATEGORIES:
             raise Exception("Invalid category")
 
-        market_id = self._generate_market_id()
-        min_stake = u256(int(float(min_stake_eth) * 1000000000000000000))  # Convert ETH to wei
+        if settlement_mode not in SETTLEMENT_MODES:
+            raise Exception("Invalid settlement mode")
 
-        # Get AI sentiment analysis
-        sentiment = self._calculate_market_sentiment(title, description, category)
+        if pricing_model not in PRICING_MODELS:
+            raise Exception("Invalid pricing model")
 
-        # Create market outcomes with initial equal pricing
-        market_outcomes = []
-        initial_price = u256(500000000000000000)  # 0.5 ETH
-        
-        for i, outcome_desc in enumerate(outcomes):
-            outcome = MarketOutcome(
-                id=f"outcome_{i+1}",
-                description=outcome_desc,
-                total_stakes=u256(0),
-                share_price=initial_price
-            )
-            market_outcomes.append(outcome)
+        # Virtual per-outcome reserve for cpmm markets; larger liquidity means less price impact per bet
+        liquidity = self._eth_to_wei(liquidity_eth) if pricing_model == "cpmm" else u256(0)
+        if pricing_model == "cpmm" and liquidity == 0:
+            raise Exception("Liquidity must be positive")
+
+        market_num = self._generate_market_num()
+        min_stake = self._eth_to_wei(min_stake_eth)
+
+        # Sentiment analysis runs later through analyze_market / analyze_pending, unless an
+        # equivalent market was analyzed recently and the cached result can be stored right away
+        cached_analysis = self._cached_sentiment(
+            self._sentiment_cache_key(title, description, category), self._now()
+        )
 
         # Create the market
         market = Market(
-            id=market_id,
             title=title,
             description=description,
             category=category,
@@ -288,89 +782,375 @@ Only return valid JSON, no additional text.
             creation_date="2025-10-19",  # You could make this dynamic
             resolution_date=resolution_date,
             resolution_source=resolution_source,
-            status="active",
-            outcomes=market_outcomes,
-            total_volume=u256(0),
-            resolved_outcome_id="",
+            outcome_descriptions=list(outcomes),
             resolution_data="",
-            min_stake=min_stake
+            analysis_status="complete" if cached_analysis else "pending",
+            analysis=cached_analysis
         )
 
-        self.markets[market_id] = market
-        return market_id
+        # Equal stakes (or pools) give every outcome the same initial price
+        state = MarketState(
+            status=u8(MARKET_STATUSES.index("active")),
+            category=u8(CATEGORIES.index(category)),
+            pricing_model=u8(PRICING_MODELS.index(pricing_model)),
+            settlement_mode=u8(SETTLEMENT_MODES.index(settlement_mode)),
+            min_stake=min_stake,
+            total_volume=u256(0),
+            total_stakes=u256(0),
+            pot=u256(0),
+            payout_ratio=u256(0),
+            resolved_outcome=u8(0),
+            outcome_stakes=[u256(0)] * len(outcomes),
+            outcome_pools=[liquidity] * len(outcomes) if pricing_model == "cpmm" else []
+        )
 
-    @gl.public.write
-    def place_bet(self, market_id: str, outcome_id: str) -> None:
-        """Place a bet on a specific outcome"""
-        if market_id not in self.markets:
-            raise Exception("Market not found")
-        
-        market = self.markets[market_id]
-        if market.status != "active":
-            raise Exception("Market is not active")
+        self.markets[market_num] = market
+        self.market_states[market_num] = state
+        self.market_titles[market_num] = title
+        if not cached_analysis:
+            self.pending_analysis.append(market_num)
+        self._index_market(market_num, state)
+        self._update_trending(market_num, state)
+        self._touch_market(market_num)
+        return self._market_id(market_num)
 
-        # Find the outcome
-        outcome_index = -1
-        for i, outcome in enumerate(market.outcomes):
-            if outcome.id == outcome_id:
-                outcome_index = i
-                break
-        
-        if outcome_index == -1:
-            raise Exception("Outcome not found")
+    def _analyze(self, market_num: int, market: Market) -> None:
+        sentiment = self._calculate_market_sentiment(market.title, market.description, market.category)
+        market.analysis = json.dumps(sentiment, sort_keys=True)
+        market.analysis_status = "complete"
+        self._touch_market(market_num)
 
-        sender = gl.message.sender_address
-        stake_amount = gl.message.value
+    @gl.public.write
+    def analyze_market(self, market_id: str) -> None:
+        """Run the deferred AI sentiment analysis for one market"""
+        market_num = self._parse_market_num(market_id)
+        market = self.markets[market_num]
+        if market.analysis_status == "complete":
+            raise Exception("Market already analyzed")
 
-        if stake_amount < market.min_stake:
-            raise Exception(f"Minimum stake is {market.min_stake}")
+        self._analyze(market_num, market)
 
-        # Calculate current share price
-        total_market_stakes = sum(outcome.total_stakes for outcome in market.outcomes)
-        current_price = self._calculate_share_price(market.outcomes[outcome_index], total_market_stakes)
-        shares_purchased = u256(int(float(stake_amount) / float(current_price) * 1000000000000000000))
+    @gl.public.write
+    def analyze_pending(self, limit: int = 5) -> int:
+        """Analyze up to `limit` markets from the pending queue, oldest first"""
+        analyzed = 0
+        head = self.pending_analysis_head
+        while head < len(self.pending_analysis) and analyzed < limit:
+            market_num = self.pending_analysis[head]
+            market = self.markets[market_num]
+            head += 1
+            # Markets analyzed directly through analyze_market are just skipped
+            if market.analysis_status == "pending":
+                self._analyze(market_num, market)
+                analyzed += 1
 
-        # Update outcome stakes
-        market.outcomes[outcome_index].total_stakes += stake_amount
-        market.total_volume += stake_amount
+        self.pending_analysis_head = head
+        return analyzed
+
+    def _credit_position(self, owner: Address, market_num: int, outcome_index: int, shares: u256, invested: u256) -> None:
+        """Add shares and their stake basis to a position, opening it if needed"""
+        position_key = self._position_key(market_num, outcome_index)
+        user_positions = self.user_positions.get_or_insert_default(owner)
 
-        # Update user position
-        position_key = f"{market_id}_{outcome_id}"
-        user_positions = self.user_positions.get_or_insert_default(sender)
-        
         if position_key in user_positions:
             # Update existing position
             position = user_positions[position_key]
-            old_total_shares = position.shares
-            old_total_invested = position.total_invested
-            
-            position.shares += shares_purchased
-            position.total_invested += stake_amount
-            position.average_price = u256(int(float(position.total_invested) / float(position.shares) * 1000000000000000000))
+            position.shares += shares
+            position.total_invested += invested
+            position.average_price = u256(position.total_invested * WEI_PER_ETH // position.shares)
         else:
             # Create new position
             position = UserPosition(
-                market_id=market_id,
-                outcome_id=outcome_id,
-                shares=shares_purchased,
-                total_invested=stake_amount,
-                average_price=current_price
+                market_num=market_num,
+                outcome_index=outcome_index,
+                shares=shares,
+                total_invested=invested,
+                average_price=u256(invested * WEI_PER_ETH // shares),
+                claimed=False
             )
             user_positions[position_key] = position
+            self._link_append(self.user_position_keys.get_or_insert_default(owner), position_key)
+            holders = self.position_holders.get_or_insert_default(position_key)
+            self.position_holder_slots.get_or_insert_default(position_key)[owner] = len(holders)
+            holders.append(owner)
+
+    def _fill_orders(self, market_num: int, state: MarketState, outcome_index: int, sender: Address, amount: u256) -> u256:
+        """Buy from resting orders priced at or below the AMM price, cheapest first; returns the unspent amount"""
+        position_key = self._position_key(market_num, outcome_index)
+        if position_key not in self.order_books:
+            return amount
+
+        amm_price = self._outcome_prices(state)[outcome_index]
+        book = self.order_books[position_key]
+        fills = 0
+        while amount > 0 and len(book) > 0 and fills < MAX_ORDER_FILLS:
+            book_key = next(iter(book))
+            order = self.orders[book[book_key]]
+            if order.price > amm_price:
+                break
+
+            # Share prices are below 1 ETH, so a partial fill spends the whole remaining amount
+            shares = min(order.shares, u256(amount * WEI_PER_ETH // order.price))
+            cost = u256(-(-shares * order.price // WEI_PER_ETH))
+            # The stake basis (and so the pot claim) moves with the shares; stakes are unchanged
+            invested = u256(order.invested * shares // order.shares)
+            order.shares -= shares
+            order.invested -= invested
+            amount -= cost
+            state.total_volume += cost
+            fills += 1
+
+            self._credit_position(sender, market_num, outcome_index, shares, invested)
+            self.user_balances[order.owner] = self.user_balances.get(order.owner, u256(0)) + cost
+            if order.shares == 0:
+                del self.orders[book[book_key]]
+                del book[book_key]
+
+        return amount
+
+    def _apply_bet(self, market_num: int, state: MarketState, outcome_index: int, sender: Address, stake_amount: u256) -> None:
+        """Buy shares of one outcome for `sender` from resting orders, then the AMM"""
+        if stake_amount < state.min_stake:
+            raise Exception(f"Minimum stake is {state.min_stake}")
+
+        stake_amount = self._fill_orders(market_num, state, outcome_index, sender, stake_amount)
+        if stake_amount == 0:
+            return
+
+        # Calculate current share price
+        if PRICING_MODELS[state.pricing_model] == "cpmm":
+            shares_purchased = self._cpmm_buy(state.outcome_pools, outcome_index, stake_amount)
+            if shares_purchased == 0:
+                raise Exception("Stake too small to buy any shares")
+        else:
+            current_price = self._calculate_share_price(state.outcome_stakes[outcome_index], state.total_stakes)
+            shares_purchased = u256(int(float(stake_amount) / float(current_price) * 1000000000000000000))
+
+        # Update outcome stakes
+        state.outcome_stakes[outcome_index] += stake_amount
+        state.total_volume += stake_amount
+        state.total_stakes += stake_amount
+        state.pot += stake_amount
+
+        self._credit_position(sender, market_num, outcome_index, shares_purchased, stake_amount)
+        # Share prices are derived from stakes and pools on read, so nothing else is rewritten here
+
+    def _close_position(self, owner: Address, position_key: u256) -> None:
+        """Delete an empty position and unlink it from the portfolio and holder lists"""
+        del self.user_positions[owner][position_key]
+        self._link_remove(self.user_position_keys[owner], position_key)
+
+        # Holders are unordered, so the last one moves into the freed slot
+        holders = self.position_holders[position_key]
+        slots = self.position_holder_slots[position_key]
+        slot = slots[owner]
+        last_holder = holders[len(holders) - 1]
+        holders[slot] = last_holder
+        slots[last_holder] = slot
+        holders.pop()
+        del slots[owner]
+
+    @gl.public.write
+    def sell_shares(self, market_id: str, outcome_id: str, shares: str) -> str:
+        """Sell shares of an open position back to the market maker, returning the proceeds in wei"""
+        market_num = self._parse_market_num(market_id)
+        state = self.market_states[market_num]
+        if MARKET_STATUSES[state.status] != "active":
+            raise Exception("Market is not active")
+
+        outcome_index = self._parse_outcome_index(state, outcome_id)
+        if int(shares) <= 0:
+            raise Exception("Shares must be positive")
+        share_amount = u256(int(shares))
+        sender = gl.message.sender_address
+        position_key = self._position_key(market_num, outcome_index)
+        if sender not in self.user_positions or position_key not in self.user_positions[sender]:
+            raise Exception("No position in this outcome")
+        position = self.user_positions[sender][position_key]
+        if share_amount > position.shares:
+            raise Exception("Not enough shares")
+
+        # The sold shares take a proportional part of the stake basis off the outcome
+        invested = u256(position.total_invested * share_amount // position.shares)
+        prices_before = self._outcome_prices(state)
+        if PRICING_MODELS[state.pricing_model] == "cpmm":
+            value = self._cpmm_sell(state.outcome_pools, outcome_index, share_amount)
+        else:
+            # Valued at the current price, as a bet would buy them
+            value = u256(share_amount * prices_before[outcome_index] // WEI_PER_ETH)
+        # The AMM's liquidity is virtual, so any gain would be paid out of other bettors' stakes.
+        # Proceeds are capped at the stake basis sold and value above it stays in the pot for the winners
+        proceeds = min(value, invested)
+
+        state.outcome_stakes[outcome_index] -= invested
+        state.total_stakes -= invested
+        state.pot -= proceeds
+        state.total_volume += proceeds
+
+        # Selling part of a position leaves its average price unchanged
+        position.shares -= share_amount
+        position.total_invested -= invested
+        if position.shares == 0:
+            self._close_position(sender, position_key)
+        self.user_balances[sender] = self.user_balances.get(sender, u256(0)) + proceeds
+
+        volumes = [0] * len(prices_before)
+        volumes[outcome_index] = proceeds
+        self._record_prices(market_num, prices_before, self._outcome_prices(state), volumes)
+        self._update_trending(market_num, state)
+        self._touch_market(market_num)
+        return str(proceeds)
+
+    def _order_id(self, order_num: int) -> str:
+        return f"order_{order_num}"
+
+    def _parse_order_num(self, order_id: str) -> int:
+        number = order_id[len("order_"):] if order_id.startswith("order_") else order_id
+        if not number.isdigit() or int(number) not in self.orders:
+            raise Exception("Order not found")
+        return int(number)
 
-        # Update market with new share prices for all outcomes
-        new_total_stakes = sum(outcome.total_stakes for outcome in market.outcomes)
-        for outcome in market.outcomes:
-            outcome.share_price = self._calculate_share_price(outcome, new_total_stakes)
+    def _remove_order(self, order_num: int) -> LimitOrder:
+        """Take an order off its book and delete it"""
+        order = self.orders[order_num]
+        position_key = self._position_key(order.market_num, order.outcome_index)
+        del self.order_books[position_key][order.price * ORDER_ID_SPACE + order_num]
+        del self.orders[order_num]
+        return order
+
+    @gl.public.write
+    def place_limit_order(self, market_id: str, outcome_id: str, shares: str, price: str) -> str:
+        """Offer shares of a held position for sale at a fixed price in wei per share"""
+        market_num = self._parse_market_num(market_id)
+        state = self.market_states[market_num]
+        if MARKET_STATUSES[state.status] != "active":
+            raise Exception("Market is not active")
+
+        outcome_index = self._parse_outcome_index(state, outcome_id)
+        if int(shares) <= 0:
+            raise Exception("Shares must be positive")
+        if not 0 < int(price) < WEI_PER_ETH:
+            raise Exception("Price must be between 0 and 1 ETH per share")
+        share_amount = u256(int(shares))
+        price_wei = u256(int(price))
+        # Keeps bets from having to walk books of dust orders
+        if share_amount * price_wei // WEI_PER_ETH < state.min_stake:
+            raise Exception(f"Minimum order value is {state.min_stake}")
+
+        sender = gl.message.sender_address
+        position_key = self._position_key(market_num, outcome_index)
+        if sender not in self.user_positions or position_key not in self.user_positions[sender]:
+            raise Exception("No position in this outcome")
+        position = self.user_positions[sender][position_key]
+        if position.shares < share_amount:
+            raise Exception("Not enough shares")
+
+        # Escrow the shares with a proportional part of the stake basis; an emptied position is
+        # closed and reopened if the order is cancelled
+        invested = u256(position.total_invested * share_amount // position.shares)
+        position.shares -= share_amount
+        position.total_invested -= invested
+        if position.shares == 0:
+            self._close_position(sender, position_key)
+
+        self.order_counter += 1
+        order_num = self.order_counter
+        self.orders[order_num] = LimitOrder(
+            owner=sender,
+            market_num=market_num,
+            outcome_index=outcome_index,
+            price=price_wei,
+            shares=share_amount,
+            invested=invested
+        )
+        self.order_books.get_or_insert_default(position_key)[price_wei * ORDER_ID_SPACE + order_num] = order_num
+        self._touch_market(market_num)
+        return self._order_id(order_num)
+
+    @gl.public.write
+    def cancel_order(self, order_id: str) -> None:
+        """Cancel a resting order and return its unfilled shares to the caller's position.
+        Orders left on a resolved market are settled instead: escrowed winning shares are paid out"""
+        order_num = self._parse_order_num(order_id)
+        if self.orders[order_num].owner != gl.message.sender_address:
+            raise Exception("Only the order owner can cancel it")
+
+        order = self._remove_order(order_num)
+        state = self.market_states[order.market_num]
+        if MARKET_STATUSES[state.status] == "active":
+            self._credit_position(order.owner, order.market_num, order.outcome_index, order.shares, order.invested)
+        elif MARKET_STATUSES[state.status] == "resolved" and order.outcome_index == state.resolved_outcome:
+            payout = u256(order.invested * state.payout_ratio // PAYOUT_RATIO_SCALE)
+            self.user_balances[order.owner] = self.user_balances.get(order.owner, u256(0)) + payout
+        self._touch_market(order.market_num)
+
+    @gl.public.write
+    def place_bet(self, market_id: str, outcome_id: str) -> None:
+        """Place a bet on a specific outcome"""
+        market_num = self._parse_market_num(market_id)
+        state = self.market_states[market_num]
+        if MARKET_STATUSES[state.status] != "active":
+            raise Exception("Market is not active")
+
+        outcome_index = self._parse_outcome_index(state, outcome_id)
+        prices_before = self._outcome_prices(state)
+        self._apply_bet(market_num, state, outcome_index, gl.message.sender_address, gl.message.value)
+        volumes = [0] * len(prices_before)
+        volumes[outcome_index] = gl.message.value
+        self._record_prices(market_num, prices_before, self._outcome_prices(state), volumes)
+        self._update_trending(market_num, state)
+        self._touch_market(market_num)
+
+    @gl.public.write
+    def place_bets(self, legs: List[dict]) -> None:
+        """Place several bets atomically, funded by one payment covering every leg"""
+        # Each leg is {"market_id", "outcome_id", "amount"} with the amount in wei
+        if len(legs) == 0:
+            raise Exception("No bets given")
+
+        # Validate every leg before touching any state, loading each market once
+        states_by_id = {}
+        resolved_legs = []
+        total_amount = 0
+        for leg in legs:
+            market_id = leg["market_id"]
+            market_num = self._parse_market_num(market_id)
+            if market_num not in states_by_id:
+                state = self.market_states[market_num]
+                if MARKET_STATUSES[state.status] != "active":
+                    raise Exception(f"Market is not active: {market_id}")
+                states_by_id[market_num] = state
+
+            state = states_by_id[market_num]
+            amount = u256(int(leg["amount"]))
+            if amount < state.min_stake:
+                raise Exception(f"Minimum stake for {market_id} is {state.min_stake}")
+            resolved_legs.append((market_num, state, self._parse_outcome_index(state, leg["outcome_id"]), amount))
+            total_amount += amount
+
+        if total_amount != gl.message.value:
+            raise Exception("Bet amounts must add up to the value sent")
+
+        prices_before = {market_num: self._outcome_prices(state) for market_num, state in states_by_id.items()}
+        volumes = {market_num: [0] * len(state.outcome_stakes) for market_num, state in states_by_id.items()}
+        sender = gl.message.sender_address
+        for market_num, state, outcome_index, amount in resolved_legs:
+            self._apply_bet(market_num, state, outcome_index, sender, amount)
+            volumes[market_num][outcome_index] += amount
+
+        # Chart, re-rank and log each touched market once rather than once per leg
+        for market_num, state in states_by_id.items():
+            self._record_prices(market_num, prices_before[market_num], self._outcome_prices(state), volumes[market_num])
+            self._update_trending(market_num, state)
+            self._touch_market(market_num)
 
     @gl.public.write
     def resolve_market(self, market_id: str) -> None:
         """Resolve a market using AI analysis"""
-        if market_id not in self.markets:
-            raise Exception("Market not found")
-        
-        market = self.markets[market_id]
-        if market.status != "active":
+        market_num = self._parse_market_num(market_id)
+        market = self.markets[market_num]
+        state = self.market_states[market_num]
+        if MARKET_STATUSES[state.status] != "active":
             raise Exception("Market is not active")
 
         # Only market creator or contract owner can resolve
@@ -383,40 +1163,126 @@ Only return valid JSON, no additional text.
         if resolution_result["resolved_outcome_id"] is None:
             raise Exception("Market cannot be resolved yet - insufficient data")
 
+        self._apply_resolution(market_num, market, state, resolution_result)
+
+    @gl.public.write
+    def resolve_markets(self, market_ids: List[str]) -> List[str]:
+        """Resolve several markets, fetching and prompting once per shared resolution source"""
+        sender = gl.message.sender_address
+
+        # Group markets by resolution source, preserving the requested order
+        groups = {}
+        for market_id in market_ids:
+            market_num = self._parse_market_num(market_id)
+            if MARKET_STATUSES[self.market_states[market_num].status] != "active":
+                raise Exception(f"Market is not active: {market_id}")
+            market = self.markets[market_num]
+            if sender != market.creator:
+                raise Exception(f"Only market creator can resolve {market_id}")
+            groups.setdefault(market.resolution_source, {})[self._market_id(market_num)] = market
+
+        resolved_ids = []
+        for resolution_source, markets in groups.items():
+            results = self._resolve_markets_with_ai(markets, resolution_source)
+            for market_id, market in markets.items():
+                resolution_result = results.get(market_id)
+                # Markets the source cannot settle yet stay active for a later attempt
+                if not resolution_result:
+                    continue
+                outcome_ids = [self._outcome_id(i) for i in range(len(market.outcome_descriptions))]
+                if resolution_result.get("resolved_outcome_id") not in outcome_ids:
+                    continue
+                market_num = self._parse_market_num(market_id)
+                self._apply_resolution(market_num, market, self.market_states[market_num], resolution_result)
+                resolved_ids.append(market_id)
+
+        return resolved_ids
+
+    def _apply_resolution(self, market_num: int, market: Market, state: MarketState, resolution_result: dict) -> None:
+        """Record a resolution outcome and settle the market"""
+        winning_index = self._parse_outcome_index(state, resolution_result["resolved_outcome_id"])
+
         # Update market status
-        market.status = "resolved"
-        market.resolved_outcome_id = resolution_result["resolved_outcome_id"]
+        self._set_market_status(market_num, state, MARKET_STATUSES.index("resolved"))
+        self._remove_from_trending(market_num, state)
+        state.resolved_outcome = winning_index
+        state.payout_ratio = self._calculate_payout_ratio(state, winning_index)
         market.resolution_data = json.dumps(resolution_result)
+        self._touch_market(market_num)
 
-        # Distribute winnings to users with winning positions
-        self._distribute_winnings(market_id, resolution_result["resolved_outcome_id"])
+        # Claim-mode markets stop here; winners pull their payouts with claim_winnings
+        if SETTLEMENT_MODES[state.settlement_mode] == "push":
+            self._distribute_winnings(market_num, winning_index)
 
-    def _distribute_winnings(self, market_id: str, winning_outcome_id: str) -> None:
+    def _calculate_payout_ratio(self, state: MarketState, winning_index: int) -> u256:
+        """Wei paid out per wei staked on the winning outcome, scaled by PAYOUT_RATIO_SCALE"""
+        winning_stakes = state.outcome_stakes[winning_index]
+        if winning_stakes == 0:
+            return u256(0)  # No one won
+
+        return u256(state.pot * PAYOUT_RATIO_SCALE // winning_stakes)
+
+    def _position_payout(self, state: MarketState, position: UserPosition) -> u256:
+        """Winnings owed on a position: (user_stake / total_winning_stakes) * market_pot"""
+        return u256(position.total_invested * state.payout_ratio // PAYOUT_RATIO_SCALE)
+
+    def _distribute_winnings(self, market_num: int, winning_index: int) -> None:
         """Distribute winnings to users who bet on the correct outcome"""
-        market = self.markets[market_id]
-        
-        # Calculate total winning stakes
-        winning_stakes = u256(0)
-        for outcome in market.outcomes:
-            if outcome.id == winning_outcome_id:
-                winning_stakes = outcome.total_stakes
-                break
+        state = self.market_states[market_num]
 
-        if winning_stakes == 0:
+        if state.payout_ratio == 0:
             return  # No one won
 
-        # Distribute proportionally to winners
-        for user_addr, positions in self.user_positions.items():
-            position_key = f"{market_id}_{winning_outcome_id}"
-            if position_key in positions:
-                position = positions[position_key]
-                # Calculate winnings: (user_stake / total_winning_stakes) * total_market_volume
-                user_share_ratio = float(position.total_invested) / float(winning_stakes)
-                winnings = u256(int(user_share_ratio * float(market.total_volume)))
-                
-                # Add to user balance
-                current_balance = self.user_balances.get(user_addr, u256(0))
-                self.user_balances[user_addr] = current_balance + winnings
+        # Distribute proportionally to winners, visiting only holders of the winning outcome
+        position_key = self._position_key(market_num, winning_index)
+        if position_key not in self.position_holders:
+            return
+
+        for user_addr in self.position_holders[position_key]:
+            position = self.user_positions[user_addr][position_key]
+            position.claimed = True
+
+            # Add to user balance
+            current_balance = self.user_balances.get(user_addr, u256(0))
+            self.user_balances[user_addr] = current_balance + self._position_payout(state, position)
+
+    def _claim_position(self, sender: Address, market_id: str) -> u256:
+        """Settle the sender's winning position in a resolved market, returning the payout"""
+        market_num = self._parse_market_num(market_id)
+        state = self.market_states[market_num]
+        if MARKET_STATUSES[state.status] != "resolved":
+            raise Exception("Market is not resolved")
+
+        position_key = self._position_key(market_num, state.resolved_outcome)
+        if sender not in self.user_positions or position_key not in self.user_positions[sender]:
+            raise Exception("No winning position in this market")
+
+        position = self.user_positions[sender][position_key]
+        if position.claimed:
+            raise Exception("Winnings already claimed")
+
+        position.claimed = True
+        return self._position_payout(state, position)
+
+    @gl.public.write
+    def claim_winnings(self, market_id: str) -> str:
+        """Credit the caller's winnings from a resolved market to their withdrawable balance"""
+        sender = gl.message.sender_address
+        winnings = self._claim_position(sender, market_id)
+
+        self.user_balances[sender] = self.user_balances.get(sender, u256(0)) + winnings
+        return str(winnings)
+
+    @gl.public.write
+    def claim_all_winnings(self, market_ids: List[str]) -> str:
+        """Claim winnings from several resolved markets in one transaction"""
+        sender = gl.message.sender_address
+        winnings = u256(0)
+        for market_id in market_ids:
+            winnings += self._claim_position(sender, market_id)
+
+        self.user_balances[sender] = self.user_balances.get(sender, u256(0)) + winnings
+        return str(winnings)
 
     @gl.public.write
     def withdraw_balance(self) -> None:
@@ -431,49 +1297,144 @@ Only return valid JSON, no additional text.
         # In a real implementation, you'd transfer the ETH here
         # gl.transfer(sender, balance)
 
+    def _market_list_dict(self, market_num: int) -> dict:
+        market = self.markets[market_num]
+        state = self.market_states[market_num]
+        return {
+            "id": self._market_id(market_num),
+            "title": market.title,
+            "description": market.description,
+            "category": market.category,
+            "creator": market.creator.as_hex,
+            "creation_date": market.creation_date,
+            "resolution_date": market.resolution_date,
+            "status": MARKET_STATUSES[state.status],
+            "total_volume": str(state.total_volume),
+            "outcomes": self._outcome_dicts(market, state)
+        }
+
+    def _outcome_dicts(self, market: Market, state: MarketState) -> List[dict]:
+        return [
+            {
+                "id": self._outcome_id(i),
+                "description": description,
+                "total_stakes": str(stakes),
+                "share_price": str(price)
+            } for i, (description, stakes, price) in enumerate(
+                zip(market.outcome_descriptions, state.outcome_stakes, self._outcome_prices(state))
+            )
+        ]
+
     # View functions
     @gl.public.view
-    def get_markets(self, category: str = "", status: str = "") -> List[dict]:
-        """Get all markets, optionally filtered by category and status"""
-        result = []
-        for market in self.markets.values():
-            if category and market.category != category:
-                continue
-            if status and market.status != status:
-                continue
-                
-            market_dict = {
-                "id": market.id,
-                "title": market.title,
-                "description": market.description,
-                "category": market.category,
-                "creator": market.creator.as_hex,
-                "creation_date": market.creation_date,
-                "resolution_date": market.resolution_date,
-                "status": market.status,
-                "total_volume": str(market.total_volume),
-                "outcomes": [
-                    {
-                        "id": outcome.id,
-                        "description": outcome.description,
-                        "total_stakes": str(outcome.total_stakes),
-                        "share_price": str(outcome.share_price)
-                    } for outcome in market.outcomes
-                ]
-            }
-            result.append(market_dict)
-        
-        return result
+    def get_markets(self, category: str = "", status: str = "", cursor: int = 0, limit: int = 0) -> List[dict]:
+        """Get markets filtered by category and status, paged by limit (0 = no limit) after the market numbered `cursor`"""
+        # Pages come straight from the filter index, so only the returned markets are loaded; the
+        # cursor is the number of the last market of the previous page, so markets leaving the
+        # filter between pages never shift the next page
+        return [self._market_list_dict(market_num) for market_num in self._index_page(category, status, cursor, limit)]
+
+    @gl.public.view
+    def get_changes_since(self, version: int = 0, limit: int = 100) -> dict:
+        """Get markets changed after `version`, oldest change first, for incremental client sync"""
+        current_version = int(self.state_version)
+        oldest_logged = max(1, current_version - CHANGE_LOG_CAPACITY + 1)
+        if version + 1 < oldest_logged or version > current_version:
+            # The client is further behind than the log reaches, or synced with another deployment
+            # (a version from the future), and must reload with get_markets
+            return {"version": current_version, "reset": True, "has_more": False, "markets": []}
+
+        markets = []
+        scanned = version
+        while scanned < current_version and len(markets) < limit:
+            scanned += 1
+            market_num = self.change_log[(scanned - 1) % CHANGE_LOG_CAPACITY]
+            # Skip entries superseded by a later change to the same market
+            if self.market_versions[market_num] == scanned:
+                markets.append(self._market_list_dict(market_num))
+
+        return {
+            "version": scanned,
+            "reset": False,
+            "has_more": scanned < current_version,
+            "markets": markets
+        }
+
+    @gl.public.view
+    def get_market_summaries(
+        self,
+        market_ids: List[str],
+        fields: List[str],
+        category: str = "",
+        status: str = "",
+        cursor: int = 0,
+        limit: int = 20
+    ) -> List[dict]:
+        """Get only the requested columns for the given markets, or for a page of a category/status filter"""
+        fields = list(fields) or DEFAULT_SUMMARY_FIELDS
+        for field in fields:
+            if field not in SUMMARY_FIELDS:
+                raise Exception(f"Unknown summary field: {field}")
+        needs_metadata = any(field in COLD_SUMMARY_FIELDS for field in fields)
+        needs_prices = "prices" in fields or "top_outcomes" in fields
+
+        if market_ids:
+            market_nums = [self._parse_market_num(market_id) for market_id in market_ids]
+        else:
+            market_nums = self._index_page(category, status, cursor, limit)
+
+        summaries = []
+        for market_num in market_nums:
+            state = self.market_states[market_num]
+            market = self.markets[market_num] if needs_metadata else None
+            prices = self._outcome_prices(state) if needs_prices else []
+
+            summary = {}
+            for field in fields:
+                if field == "id":
+                    summary["id"] = self._market_id(market_num)
+                elif field == "title":
+                    summary["title"] = self.market_titles[market_num]
+                elif field == "category":
+                    summary["category"] = CATEGORIES[state.category]
+                elif field == "status":
+                    summary["status"] = MARKET_STATUSES[state.status]
+                elif field == "total_volume":
+                    summary["total_volume"] = str(state.total_volume)
+                elif field == "outcome_count":
+                    summary["outcome_count"] = len(state.outcome_stakes)
+                elif field == "prices":
+                    summary["prices"] = [str(price) for price in prices]
+                elif field == "top_outcomes":
+                    # The two most likely outcomes, as shown on market cards
+                    ranked = sorted(range(len(prices)), key=lambda i: (-prices[i], i))[:2]
+                    summary["top_outcomes"] = [
+                        {"id": self._outcome_id(i), "share_price": str(prices[i])} for i in ranked
+                    ]
+                elif field == "creator":
+                    summary["creator"] = market.creator.as_hex
+                elif field == "outcome_descriptions":
+                    summary["outcome_descriptions"] = list(market.outcome_descriptions)
+                else:
+                    summary[field] = getattr(market, field)
+            summaries.append(summary)
+
+        return summaries
+
+    @gl.public.view
+    def get_market_count(self, category: str = "", status: str = "") -> int:
+        """Number of markets matching a get_markets filter"""
+        return self.market_index_sizes.get(f"{category}|{status}", u256(0))
 
     @gl.public.view
     def get_market(self, market_id: str) -> dict:
         """Get detailed information about a specific market"""
-        if market_id not in self.markets:
-            raise Exception("Market not found")
-        
-        market = self.markets[market_id]
+        market_num = self._parse_market_num(market_id)
+        market = self.markets[market_num]
+        state = self.market_states[market_num]
+        status = MARKET_STATUSES[state.status]
         return {
-            "id": market.id,
+            "id": self._market_id(market_num),
             "title": market.title,
             "description": market.description,
             "category": market.category,
@@ -481,43 +1442,137 @@ Only return valid JSON, no additional text.
             "creation_date": market.creation_date,
             "resolution_date": market.resolution_date,
             "resolution_source": market.resolution_source,
-            "status": market.status,
-            "total_volume": str(market.total_volume),
-            "resolved_outcome_id": market.resolved_outcome_id,
+            "status": status,
+            "total_volume": str(state.total_volume),
+            "pot": str(state.pot),
+            "resolved_outcome_id": self._outcome_id(state.resolved_outcome) if status == "resolved" else "",
             "resolution_data": market.resolution_data,
-            "min_stake": str(market.min_stake),
-            "outcomes": [
-                {
-                    "id": outcome.id,
-                    "description": outcome.description,
-                    "total_stakes": str(outcome.total_stakes),
-                    "share_price": str(outcome.share_price)
-                } for outcome in market.outcomes
-            ]
+            "min_stake": str(state.min_stake),
+            "settlement_mode": SETTLEMENT_MODES[state.settlement_mode],
+            "pricing_model": PRICING_MODELS[state.pricing_model],
+            "payout_ratio": str(state.payout_ratio),
+            "analysis_status": market.analysis_status,
+            "analysis": market.analysis,
+            "outcomes": self._outcome_dicts(market, state)
         }
 
+    def _position_rows(self, addr: Address, status: str, cursor: int, limit: int) -> tuple:
+        """Position rows after the position key `cursor`, valued at current prices, plus the cursor to continue from (-1 at the end)"""
+        if addr not in self.user_position_keys:
+            return [], -1
+
+        links = self.user_position_keys[addr]
+        user_positions = self.user_positions[addr]
+        # Each market's hot state and prices are read once, however many positions share it
+        market_cache = {}
+        rows = []
+        last_key = cursor
+        position_key = self._link_next(links, cursor)
+        while position_key != 0 and (limit <= 0 or len(rows) < limit):
+            position = user_positions[position_key]
+            last_key = position_key
+            position_key = links[position_key].next
+
+            market_num = position.market_num
+            if market_num not in market_cache:
+                state = self.market_states[market_num]
+                market_cache[market_num] = (state, MARKET_STATUSES[state.status], self._outcome_prices(state))
+            state, market_status, prices = market_cache[market_num]
+            if status and market_status != status:
+                continue
+
+            # Open positions are marked at the current share price, settled ones at their payout
+            if market_status == "resolved":
+                won = position.outcome_index == state.resolved_outcome
+                current_value = self._position_payout(state, position) if won else u256(0)
+            else:
+                current_value = u256(position.shares * prices[position.outcome_index] // WEI_PER_ETH)
+
+            rows.append({
+                "market_id": self._market_id(market_num),
+                "market_title": self.market_titles[market_num],
+                "outcome_id": self._outcome_id(position.outcome_index),
+                "shares": str(position.shares),
+                "total_invested": str(position.total_invested),
+                "average_price": str(position.average_price),
+                "current_price": str(prices[position.outcome_index]),
+                "current_value": str(current_value),
+                "market_status": market_status,
+                "claimed": position.claimed
+            })
+
+        return rows, (int(last_key) if position_key != 0 else -1)
+
     @gl.public.view
     def get_user_positions(self, user_address: str = "") -> List[dict]:
         """Get all positions for a user"""
         addr = Address(user_address) if user_address else gl.message.sender_address
-        
-        if addr not in self.user_positions:
+        positions, _ = self._position_rows(addr, "", 0, 0)
+        return positions
+
+    @gl.public.view
+    def get_portfolio(self, user_address: str = "", status: str = "", cursor: int = 0, limit: int = 20) -> dict:
+        """Get one page of a user's positions, optionally filtered by market status, with mark-to-market values"""
+        addr = Address(user_address) if user_address else gl.message.sender_address
+        positions, next_cursor = self._position_rows(addr, status, cursor, limit)
+        return {
+            "positions": positions,
+            "page_invested": str(sum(int(position["total_invested"]) for position in positions)),
+            "page_value": str(sum(int(position["current_value"]) for position in positions)),
+            # Cursor for the next page, or -1 once every position has been read
+            "next_cursor": next_cursor
+        }
+
+    @gl.public.view
+    def get_price_candles(self, market_id: str, outcome_id: str, resolution: str = "1h", limit: int = 24) -> List[dict]:
+        """Get the latest OHLC price candles of an outcome, oldest first"""
+        if resolution not in CANDLE_RESOLUTIONS:
+            raise Exception(f"Resolution must be one of {list(CANDLE_RESOLUTIONS)}")
+        market_num = self._parse_market_num(market_id)
+        outcome_index = self._parse_outcome_index(self.market_states[market_num], outcome_id)
+        candle_key = self._candle_key(market_num, outcome_index, list(CANDLE_RESOLUTIONS).index(resolution))
+        if candle_key not in self.price_candles:
             return []
-        
-        positions = []
-        for position in self.user_positions[addr].values():
-            market = self.markets[position.market_id]
-            positions.append({
-                "market_id": position.market_id,
-                "market_title": market.title,
-                "outcome_id": position.outcome_id,
-                "shares": str(position.shares),
-                "total_invested": str(position.total_invested),
-                "average_price": str(position.average_price),
-                "market_status": market.status
+
+        # Only the last `limit` slots of the ring are read
+        candles = self.price_candles[candle_key]
+        count = self.candle_counts[candle_key]
+        result = []
+        for number in range(count - min(limit, len(candles)), count):
+            candle = candles[number % CANDLE_CAPACITY]
+            result.append({
+                "start": int(candle.start),
+                "open": str(candle.open),
+                "high": str(candle.high),
+                "low": str(candle.low),
+                "close": str(candle.close),
+                "volume": str(candle.volume)
             })
-        
-        return positions
+        return result
+
+    @gl.public.view
+    def get_order_book(self, market_id: str, outcome_id: str, limit: int = 10) -> List[dict]:
+        """Get the cheapest `limit` price levels of resting sell orders for an outcome"""
+        market_num = self._parse_market_num(market_id)
+        position_key = self._position_key(market_num, self._parse_outcome_index(self.market_states[market_num], outcome_id))
+        if position_key not in self.order_books:
+            return []
+
+        levels = []
+        for order_num in self.order_books[position_key].values():
+            order = self.orders[order_num]
+            if levels and levels[-1]["price"] == order.price:
+                levels[-1]["shares"] += order.shares
+                levels[-1]["orders"] += 1
+            elif len(levels) == limit:
+                break
+            else:
+                levels.append({"price": order.price, "shares": order.shares, "orders": 1})
+
+        return [
+            {"price": str(level["price"]), "shares": str(level["shares"]), "orders": level["orders"]}
+            for level in levels
+        ]
 
     @gl.public.view
     def get_user_balance(self, user_address: str = "") -> str:
@@ -526,20 +1581,24 @@ Only return valid JSON, no additional text.
         return str(self.user_balances.get(addr, u256(0)))
 
     @gl.public.view
-    def get_trending_markets(self) -> List[dict]:
-        """Get markets with highest activity (volume and recent bets)"""
-        # Sort markets by total volume
+    def get_trending_markets(self, limit: int = 10, category: str = "") -> List[dict]:
+        """Get active markets with the highest volume, optionally within one category"""
+        if category not in self.trending:
+            return []
+
+        # The index is kept sorted by volume, so only the top `limit` markets are read
+        limit = min(limit, self.trending_capacity)
         market_list = []
-        for market in self.markets.values():
-            if market.status == "active":
-                market_list.append({
-                    "id": market.id,
-                    "title": market.title,
-                    "category": market.category,
-                    "total_volume": market.total_volume,
-                    "outcomes_count": len(market.outcomes)
-                })
-        
-        # Sort by volume (descending)
-        market_list.sort(key=lambda x: x["total_volume"], reverse=True)
-        return market_list[:10]  # Top 10 trending markets
+        for market_num in self.trending[category].values():
+            if len(market_list) >= limit:
+                break
+            # List rows come from the hot state and titles; the market metadata is not loaded
+            state = self.market_states[market_num]
+            market_list.append({
+                "id": self._market_id(market_num),
+                "title": self.market_titles[market_num],
+                "category": CATEGORIES[state.category],
+                "total_volume": state.total_volume,
+                "outcomes_count": len(state.outcome_stakes)
+            })
+        return market_list
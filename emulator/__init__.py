@@ -0,0 +1,23 @@
+# In-process emulator of the GenLayer SDK, for running contracts as plain Python objects.
+#
+#     from emulator import Emulator
+#
+#     emulator = Emulator(prompt_handler=lambda prompt: '{"score": "2:1", "winner": 1}')
+#     contract = emulator.deploy("contracts/football_bets.py")
+#     emulator.call(contract, "create_bet", "2024-06-14", "Germany", "Scotland", "1")
+#
+# Run the gltest suite against it with `pytest --emulator`, and add `--storage-report` for the
+# storage reads, writes and bytes of each contract method (see accounting.py).
+
+from . import accounting
+from .runtime import DEFAULT_SENDER, Emulator, Message, gl, load_contract
+from .storage import (
+    Address, DynArray, TreeMap, allow_storage, bigint,
+    i8, i16, i32, i64, i128, i256, u8, u16, u32, u64, u128, u256,
+)
+
+__all__ = [
+    "accounting", "DEFAULT_SENDER", "Emulator", "Message", "gl", "load_contract",
+    "Address", "DynArray", "TreeMap", "allow_storage", "bigint",
+    "i8", "i16", "i32", "i64", "i128", "i256", "u8", "u16", "u32", "u64", "u128", "u256",
+]
@@ -0,0 +1,250 @@
+# Storage access accounting for emulated contracts.
+#
+#     from emulator import accounting
+#
+#     with accounting.measure() as stats:
+#         emulator.call(contract, "place_bet", market_id, "outcome_1", value=10 ** 16)
+#     print(stats.report())
+#
+# Every outermost public call (and every deploy) is charged the storage reads and writes it makes,
+# an estimate of the bytes they move and its wall-clock time, aggregated per "Contract.method".
+# A read is one field, map entry, array item or array length loaded; a write is one value stored,
+# sized by its full encoding. Sizes follow the storage encoding loosely (a u256 is 32 bytes, a u8
+# one byte, a string its UTF-8 length plus a 4-byte length), so they rank code paths rather than
+# predict gas. Read counting is patched into the storage classes only while accounting is enabled.
+
+import contextlib
+import dataclasses
+import typing
+
+from . import storage
+from .storage import INT_TYPES, Address, DynArray, TreeMap
+
+
+LENGTH_BYTES = 4
+_ARRAY_LENGTH = storage.u32(0)  # Stands for the length slot read by len()
+
+
+def encoded_size(value, deep: bool) -> int:
+    """Approximate encoded bytes of a value; containers only count their contents when `deep`"""
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, INT_TYPES):
+        return max(1, (int(type(value).__name__[1:]) + 7) // 8)
+    if isinstance(value, int):
+        return 32
+    if isinstance(value, str):
+        return LENGTH_BYTES + len(value.encode("utf-8"))
+    if isinstance(value, bytes):
+        return LENGTH_BYTES + len(value)
+    if isinstance(value, Address):
+        return 20
+    if isinstance(value, float):
+        return 8
+    if not deep:
+        return 0
+    if isinstance(value, TreeMap):
+        return LENGTH_BYTES + sum(encoded_size(key, True) + encoded_size(item, True) for key, item in value._items.items())
+    if isinstance(value, list):
+        return LENGTH_BYTES + sum(encoded_size(item, True) for item in list.copy(value))
+    if dataclasses.is_dataclass(value):
+        return sum(encoded_size(value.__dict__[field.name], True) for field in dataclasses.fields(value))
+    return 0
+
+
+@dataclasses.dataclass
+class MethodStats:
+    calls: int = 0
+    failures: int = 0
+    reads: int = 0
+    writes: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+
+    def per_call(self) -> dict:
+        calls = max(self.calls, 1)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "reads": self.reads / calls,
+            "writes": self.writes / calls,
+            "bytes_read": self.bytes_read / calls,
+            "bytes_written": self.bytes_written / calls,
+            "ms": self.seconds * 1000 / calls,
+        }
+
+
+class StorageAccounting:
+    def __init__(self, parent: typing.Optional["StorageAccounting"] = None):
+        self.methods: typing.Dict[str, MethodStats] = {}
+        # An enclosing accounting that every access is also reported to
+        self._parent = parent
+        self._current: typing.Optional[MethodStats] = None
+        self._reads = self._writes = self._bytes_read = self._bytes_written = 0
+
+    def begin(self, method: str) -> None:
+        if self._parent is not None:
+            self._parent.begin(method)
+        self._current = self.methods.setdefault(method, MethodStats())
+        self._reads = self._writes = self._bytes_read = self._bytes_written = 0
+
+    def end(self, seconds: float, succeeded: bool) -> None:
+        if self._parent is not None:
+            self._parent.end(seconds, succeeded)
+        stats, self._current = self._current, None
+        stats.calls += 1
+        stats.failures += not succeeded
+        stats.reads += self._reads
+        stats.writes += self._writes
+        stats.bytes_read += self._bytes_read
+        stats.bytes_written += self._bytes_written
+        stats.seconds += seconds
+
+    def read(self, value) -> None:
+        if self._parent is not None:
+            self._parent.read(value)
+        if self._current is not None:
+            self._reads += 1
+            self._bytes_read += encoded_size(value, False)
+
+    def write(self, *values) -> None:
+        if self._parent is not None:
+            self._parent.write(*values)
+        if self._current is not None:
+            self._writes += 1
+            self._bytes_written += sum(encoded_size(value, True) for value in values)
+
+    def track(self, cls: type) -> None:
+        """Count reads of the storage fields of a dataclass or contract class"""
+        fields = {field.name for field in dataclasses.fields(cls)} if dataclasses.is_dataclass(cls) else set()
+        fields |= {name for klass in cls.__mro__ for name in vars(klass).get("__annotations__", {})}
+        _originals.append((cls, "_accounted_fields", cls.__dict__.get("_accounted_fields")))
+        _originals.append((cls, "__getattribute__", cls.__dict__.get("__getattribute__")))
+        cls._accounted_fields = frozenset(fields)
+        cls.__getattribute__ = _counting_getattribute
+
+    def as_dict(self) -> dict:
+        """Per-call averages by method, for a debug view or a JSON dump"""
+        return {method: stats.per_call() for method, stats in sorted(self.methods.items())}
+
+    def report(self) -> str:
+        """Table of per-call averages, most storage traffic first"""
+        rows = sorted(
+            self.methods.items(),
+            key=lambda item: -(item[1].bytes_read + item[1].bytes_written) / max(item[1].calls, 1),
+        )
+        lines = [f"{'method':<40} {'calls':>6} {'reads':>9} {'writes':>9} {'B read':>10} {'B written':>10} {'ms':>9}"]
+        for method, stats in rows:
+            average = stats.per_call()
+            lines.append(
+                f"{method:<40} {stats.calls:>6} {average['reads']:>9.1f} {average['writes']:>9.1f} "
+                f"{average['bytes_read']:>10.0f} {average['bytes_written']:>10.0f} {average['ms']:>9.3f}"
+            )
+        return "\n".join(lines)
+
+
+def _counting_getattribute(self, name):
+    value = object.__getattribute__(self, name)
+    if name in type(self)._accounted_fields:
+        storage._access_counter.read(value)
+    return value
+
+
+def _counting_treemap_getitem(self, key):
+    value = self._items[key]
+    storage._access_counter.read(value)
+    return value
+
+
+def _counting_treemap_contains(self, key) -> bool:
+    storage._access_counter.read(None)
+    return key in self._items
+
+
+def _counting_treemap_iter(self):
+    counter = storage._access_counter
+    for key in self._keys:
+        counter.read(key)
+        yield key
+
+
+def _counting_dynarray_getitem(self, index):
+    value = list.__getitem__(self, index)
+    if isinstance(index, slice):
+        for item in value:
+            storage._access_counter.read(item)
+    else:
+        storage._access_counter.read(value)
+    return value
+
+
+def _counting_dynarray_iter(self):
+    counter = storage._access_counter
+    for item in list.__iter__(self):
+        counter.read(item)
+        yield item
+
+
+def _counting_dynarray_len(self) -> int:
+    storage._access_counter.read(_ARRAY_LENGTH)
+    return list.__len__(self)
+
+
+_READ_PATCHES = [
+    (TreeMap, "__getitem__", _counting_treemap_getitem),
+    (TreeMap, "__contains__", _counting_treemap_contains),
+    (TreeMap, "__iter__", _counting_treemap_iter),
+    (DynArray, "__getitem__", _counting_dynarray_getitem),
+    (DynArray, "__iter__", _counting_dynarray_iter),
+    (DynArray, "__len__", _counting_dynarray_len),
+]
+_originals: typing.List[tuple] = []
+
+
+def enable() -> StorageAccounting:
+    """Start counting storage accesses; returns the accounting that collects them"""
+    if storage._access_counter is not None:
+        return storage._access_counter
+
+    accounting = StorageAccounting()
+    for cls, name, patch in _READ_PATCHES:
+        _originals.append((cls, name, cls.__dict__.get(name)))
+        setattr(cls, name, patch)
+    # Classes defined later, e.g. by contracts loaded afterwards, are tracked as they are created
+    for cls in storage.storage_classes:
+        accounting.track(cls)
+
+    storage._access_counter = accounting
+    return accounting
+
+
+def disable() -> None:
+    """Stop counting and remove the read hooks"""
+    storage._access_counter = None
+    while _originals:
+        cls, name, original = _originals.pop()
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
+
+
+@contextlib.contextmanager
+def measure():
+    """Count storage accesses for the duration of a `with` block into a fresh accounting"""
+    outer = storage._access_counter
+    if outer is None:
+        accounting = enable()
+    else:
+        # Inside an enabled accounting (e.g. pytest --storage-report) the block gets its own totals,
+        # keeps reporting to the enclosing accounting and leaves the read hooks in place
+        accounting = StorageAccounting(parent=outer)
+        storage._access_counter = accounting
+    try:
+        yield accounting
+    finally:
+        if outer is None:
+            disable()
+        else:
+            storage._access_counter = outer
@@ -0,0 +1,133 @@
+# The subset of the gltest API used by test/, backed by the in-process Emulator.
+# install() registers it as the `gltest` package so the existing tests run unchanged; every
+# load_fixture call deploys afresh, which gives each test the isolated state gltest snapshots give.
+
+import dataclasses
+import re
+import sys
+import types
+import typing
+from pathlib import Path
+
+from .runtime import Emulator
+from .storage import INT_TYPES, Address, DynArray, TreeMap
+
+
+CONTRACTS_DIR = Path(__file__).resolve().parent.parent / "contracts"
+
+emulator = Emulator()
+
+
+@dataclasses.dataclass
+class Account:
+    address: str
+
+
+default_account = Account(address=emulator.sender.as_hex)
+_account_numbers = iter(range(2, 1 << 32))
+
+
+def create_account() -> Account:
+    return Account(address=Address(next(_account_numbers).to_bytes(20, "big")).as_hex)
+
+
+@dataclasses.dataclass
+class TransactionResult:
+    return_value: typing.Any = None
+    error: typing.Optional[Exception] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def _to_calldata(value):
+    """Decode a return value the way it comes back over RPC: plain dicts, lists and ints"""
+    if isinstance(value, TreeMap) or isinstance(value, dict):
+        return {_to_calldata(key): _to_calldata(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, DynArray)):
+        return [_to_calldata(item) for item in value]
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {field.name: _to_calldata(getattr(value, field.name)) for field in dataclasses.fields(value)}
+    if isinstance(value, INT_TYPES):
+        return int(value)
+    return value
+
+
+def _sender(account: typing.Optional[Account]) -> typing.Optional[Address]:
+    return Address(account.address) if account is not None else None
+
+
+class Contract:
+    def __init__(self, instance):
+        self._instance = instance
+
+    def __getattr__(self, name: str):
+        fn = getattr(self._instance, name)
+        kind = getattr(fn, "__gl_public__", None)
+        if kind is None:
+            raise AttributeError(f"{name} is not a public contract method")
+
+        def call(args: typing.Optional[list] = None, value: int = 0, account: typing.Optional[Account] = None):
+            sender = _sender(account)
+            if kind == "view":
+                return _to_calldata(emulator.call(self._instance, name, *(args or []), sender=sender))
+            # Failed transactions are reported in the result, as gltest reports them in the receipt
+            try:
+                result = emulator.call(self._instance, name, *(args or []), sender=sender, value=value)
+            except Exception as error:
+                return TransactionResult(error=error)
+            return TransactionResult(return_value=_to_calldata(result))
+
+        return call
+
+
+class ContractFactory:
+    def __init__(self, contract_path: Path, contract_name: str):
+        self.contract_path = contract_path
+        self.contract_name = contract_name
+
+    def deploy(self, args: typing.Optional[list] = None, account: typing.Optional[Account] = None) -> Contract:
+        from .runtime import load_contract
+
+        contract_class = load_contract(self.contract_path, self.contract_name)
+        return Contract(emulator.deploy(contract_class, *(args or []), sender=_sender(account)))
+
+
+def get_contract_factory(contract_name: str) -> ContractFactory:
+    pattern = re.compile(rf"^class\s+{re.escape(contract_name)}\s*\(\s*gl\.Contract\s*\)", re.MULTILINE)
+    for path in sorted(CONTRACTS_DIR.glob("*.py")):
+        if pattern.search(path.read_text()):
+            return ContractFactory(path, contract_name)
+    raise ValueError(f"Contract {contract_name} not found in {CONTRACTS_DIR}")
+
+
+def load_fixture(fixture: typing.Callable):
+    return fixture()
+
+
+def tx_execution_succeeded(result: TransactionResult) -> bool:
+    return result.succeeded
+
+
+def tx_execution_failed(result: TransactionResult) -> bool:
+    return not result.succeeded
+
+
+def install() -> None:
+    """Register this module as `gltest`, `gltest.helpers` and `gltest.assertions`"""
+    package = types.ModuleType("gltest")
+    package.__path__ = []
+    for name in ["get_contract_factory", "default_account", "create_account"]:
+        setattr(package, name, globals()[name])
+
+    helpers = types.ModuleType("gltest.helpers")
+    helpers.load_fixture = load_fixture
+
+    assertions = types.ModuleType("gltest.assertions")
+    assertions.tx_execution_succeeded = tx_execution_succeeded
+    assertions.tx_execution_failed = tx_execution_failed
+
+    package.helpers = helpers
+    package.assertions = assertions
+    sys.modules.update({"gltest": package, "gltest.helpers": helpers, "gltest.assertions": assertions})
@@ -0,0 +1,231 @@
+# The `gl` namespace of the GenLayer SDK and an Emulator that deploys and calls contracts in-process.
+# Non-deterministic calls (exec_prompt, get_webpage) go to pluggable handlers and every equivalence
+# principle runs its function once, as a single honest validator would.
+
+import functools
+import importlib.util
+import inspect
+import itertools
+import sys
+import time
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import storage
+from .storage import Address
+
+
+DEFAULT_SENDER = Address("0x" + "01" * 20)
+
+
+@dataclass
+class Message:
+    sender_address: Address
+    origin_address: Address
+    contract_address: Address
+    value: int = 0
+    chain_id: int = 61999
+
+
+class _Runtime:
+    """Process-wide state behind `gl`, set by the Emulator that is currently calling a contract"""
+
+    def __init__(self):
+        self.message = Message(DEFAULT_SENDER, DEFAULT_SENDER, Address(bytes(20)))
+        self.prompt_handler: typing.Optional[typing.Callable[[str], str]] = None
+        self.webpage_handler: typing.Optional[typing.Callable[[str, str], str]] = None
+        self.depth = 0
+
+    def invoke(self, contract, fn, kind: str, args, kwargs):
+        # Calls between public methods run inside the caller's transaction
+        if self.depth > 0:
+            return fn(contract, *args, **kwargs)
+
+        counter = storage._access_counter
+        if counter is not None:
+            counter.begin(f"{type(contract).__name__}.{fn.__name__}")
+        storage.begin_transaction()
+        self.depth = 1
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            result = fn(contract, *args, **kwargs)
+            succeeded = True
+            return result
+        finally:
+            self.depth = 0
+            # Views never persist writes
+            storage.end_transaction(succeeded and kind == "write")
+            if counter is not None:
+                counter.end(time.perf_counter() - started, succeeded)
+
+
+_runtime = _Runtime()
+
+
+def _public(kind: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            return _runtime.invoke(self, fn, kind, args, kwargs)
+
+        wrapper.__gl_public__ = kind
+        return wrapper
+
+    return decorator
+
+
+class _Write:
+    def __call__(self, fn):
+        return _public("write")(fn)
+
+    @property
+    def payable(self):
+        # Value is accepted by every emulated write method
+        return _public("write")
+
+
+class _Public:
+    write = _Write()
+    view = staticmethod(_public("view"))
+
+
+class Contract:
+    """Base class of emulated contracts; annotated fields start at their zero value"""
+
+    def __new__(cls, *args, **kwargs):
+        contract = object.__new__(cls)
+        for klass in reversed(cls.__mro__):
+            for name, tp in vars(klass).get("__annotations__", {}).items():
+                object.__setattr__(contract, name, storage.default_value(tp))
+        return contract
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        storage.storage_classes.append(cls)
+        if storage._access_counter is not None:
+            storage._access_counter.track(cls)
+
+    def __setattr__(self, name, value):
+        storage._storage_setattr(self, name, value)
+
+
+class _GL:
+    Contract = Contract
+    public = _Public()
+
+    @property
+    def message(self) -> Message:
+        return _runtime.message
+
+    def exec_prompt(self, prompt: str) -> str:
+        if _runtime.prompt_handler is None:
+            raise RuntimeError("No exec_prompt handler configured; pass prompt_handler to the Emulator")
+        return _runtime.prompt_handler(prompt)
+
+    def get_webpage(self, url: str, mode: str = "text") -> str:
+        if _runtime.webpage_handler is None:
+            raise RuntimeError("No get_webpage handler configured; pass webpage_handler to the Emulator")
+        return _runtime.webpage_handler(url, mode)
+
+    def eq_principle_strict_eq(self, fn):
+        return fn()
+
+    def eq_principle_prompt_comparative(self, fn, principle: str = ""):
+        return fn()
+
+    def eq_principle_prompt_non_comparative(self, fn, task: str = "", criteria: str = ""):
+        return fn()
+
+
+gl = _GL()
+
+
+_loaded_modules: typing.Dict[Path, object] = {}
+_module_numbers = itertools.count(1)
+
+
+def load_contract(path: typing.Union[str, Path], class_name: str = "") -> type:
+    """Import a contract file against the emulated SDK and return its contract class"""
+    path = Path(path).resolve()
+    if path not in _loaded_modules:
+        from . import sdk
+
+        spec = importlib.util.spec_from_file_location(f"_emulated_{path.stem}_{next(_module_numbers)}", path)
+        module = importlib.util.module_from_spec(spec)
+        # Contracts start with `from genlayer import *`, so the SDK stand-in is importable while loading
+        previous = sys.modules.get("genlayer")
+        sys.modules["genlayer"] = sdk
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            if previous is None:
+                del sys.modules["genlayer"]
+            else:
+                sys.modules["genlayer"] = previous
+        _loaded_modules[path] = module
+
+    module = _loaded_modules[path]
+    if class_name:
+        return getattr(module, class_name)
+    contracts = [
+        value for value in vars(module).values()
+        if inspect.isclass(value) and issubclass(value, Contract) and value is not Contract
+    ]
+    if len(contracts) != 1:
+        raise ValueError(f"{path.name} defines {len(contracts)} contracts; pass class_name")
+    return contracts[0]
+
+
+class Emulator:
+    """Deploys contracts as plain Python objects and calls them with a given sender and value"""
+
+    def __init__(
+        self,
+        prompt_handler: typing.Optional[typing.Callable[[str], str]] = None,
+        webpage_handler: typing.Optional[typing.Callable[[str, str], str]] = None,
+        sender: Address = DEFAULT_SENDER,
+    ):
+        self.prompt_handler = prompt_handler
+        self.webpage_handler = webpage_handler
+        self.sender = sender
+        self._addresses = itertools.count(1)
+
+    def _activate(self, contract_address: Address, sender: typing.Optional[Address], value: int) -> None:
+        sender = Address(sender) if sender is not None else self.sender
+        _runtime.message = Message(sender, sender, contract_address, value)
+        _runtime.prompt_handler = self.prompt_handler
+        _runtime.webpage_handler = self.webpage_handler
+
+    def deploy(self, contract: typing.Union[str, Path, type], *args, sender: typing.Optional[Address] = None, value: int = 0, **kwargs):
+        """Run a contract's constructor; `contract` is a contract class or the path of its file"""
+        contract_class = contract if inspect.isclass(contract) else load_contract(contract)
+        address = Address(next(self._addresses).to_bytes(20, "big"))
+        self._activate(address, sender, value)
+
+        counter = storage._access_counter
+        if counter is not None:
+            counter.begin(f"{contract_class.__name__}.__init__")
+        storage.begin_transaction()
+        _runtime.depth = 1
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            instance = contract_class(*args, **kwargs)
+            succeeded = True
+        finally:
+            _runtime.depth = 0
+            storage.end_transaction(True)
+            if counter is not None:
+                counter.end(time.perf_counter() - started, succeeded)
+        object.__setattr__(instance, "_emulator_address", address)
+        return instance
+
+    def call(self, contract, method: str, *args, sender: typing.Optional[Address] = None, value: int = 0, **kwargs):
+        """Call a public method as `sender`, sending `value` wei"""
+        fn = getattr(contract, method)
+        if getattr(fn, "__gl_public__", None) is None:
+            raise AttributeError(f"{method} is not a public contract method")
+        self._activate(getattr(contract, "_emulator_address", Address(bytes(20))), sender, value)
+        return fn(*args, **kwargs)
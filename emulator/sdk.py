@@ -0,0 +1,12 @@
+# Stand-in for the `genlayer` module that contracts import with `from genlayer import *`
+
+from .runtime import gl
+from .storage import (
+    Address, DynArray, TreeMap, allow_storage, bigint,
+    i8, i16, i32, i64, i128, i256, u8, u16, u32, u64, u128, u256,
+)
+
+__all__ = [
+    "Address", "DynArray", "TreeMap", "allow_storage", "bigint", "gl",
+    "i8", "i16", "i32", "i64", "i128", "i256", "u8", "u16", "u32", "u64", "u128", "u256",
+]
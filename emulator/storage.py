@@ -0,0 +1,357 @@
+# Storage types of the GenLayer SDK, backed by plain Python containers.
+# Every mutation of contract storage is journaled while a transaction is open, so a failing
+# transaction can be rolled back the way GenVM discards the writes of a reverted call. Writes are
+# converted to the declared field, key, value or item type, and sized integers that do not fit
+# raise OverflowError as they would in GenVM.
+
+import bisect
+import dataclasses
+import typing
+from collections.abc import MutableMapping
+
+
+_journal: typing.Optional[list] = None
+# Set by emulator.accounting while storage accesses are being counted
+_access_counter = None
+# Classes whose instances live in storage: allow_storage dataclasses and contracts
+storage_classes: typing.List[type] = []
+
+
+def begin_transaction() -> None:
+    global _journal
+    _journal = []
+
+
+def end_transaction(commit: bool) -> None:
+    """Close the open transaction, undoing its writes unless `commit` is set"""
+    global _journal
+    journal, _journal = _journal, None
+    if not commit and journal:
+        for undo in reversed(journal):
+            undo()
+
+
+def _record(undo: typing.Callable[[], None]) -> None:
+    if _journal is not None:
+        _journal.append(undo)
+
+
+def _sized_int(name: str, bits: int, signed: bool) -> type:
+    low = -(1 << (bits - 1)) if signed else 0
+    high = (1 << (bits - 1)) - 1 if signed else (1 << bits) - 1
+
+    def __new__(cls, value=0):
+        value = int(value)
+        if not low <= value <= high:
+            raise OverflowError(f"{value} does not fit in {name}")
+        return int.__new__(cls, value)
+
+    return type(name, (int,), {"__new__": __new__, "__slots__": ()})
+
+
+u8 = _sized_int("u8", 8, False)
+u16 = _sized_int("u16", 16, False)
+u32 = _sized_int("u32", 32, False)
+u64 = _sized_int("u64", 64, False)
+u128 = _sized_int("u128", 128, False)
+u256 = _sized_int("u256", 256, False)
+i8 = _sized_int("i8", 8, True)
+i16 = _sized_int("i16", 16, True)
+i32 = _sized_int("i32", 32, True)
+i64 = _sized_int("i64", 64, True)
+i128 = _sized_int("i128", 128, True)
+i256 = _sized_int("i256", 256, True)
+bigint = int
+
+INT_TYPES = (u8, u16, u32, u64, u128, u256, i8, i16, i32, i64, i128, i256)
+
+
+class Address:
+    """20-byte account address, built from a hex string, bytes or another Address"""
+
+    __slots__ = ("_bytes",)
+
+    def __init__(self, value: typing.Union[str, bytes, "Address"]):
+        if isinstance(value, Address):
+            raw = value._bytes
+        elif isinstance(value, str):
+            raw = bytes.fromhex(value[2:] if value.startswith(("0x", "0X")) else value)
+        else:
+            raw = bytes(value)
+        if len(raw) != 20:
+            raise ValueError(f"Address must be 20 bytes, got {len(raw)}")
+        object.__setattr__(self, "_bytes", raw)
+
+    @property
+    def as_bytes(self) -> bytes:
+        return self._bytes
+
+    @property
+    def as_hex(self) -> str:
+        return "0x" + self._bytes.hex()
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Address) and other._bytes == self._bytes
+
+    def __lt__(self, other: "Address") -> bool:
+        return self._bytes < other._bytes
+
+    def __hash__(self) -> int:
+        return hash(self._bytes)
+
+    def __repr__(self) -> str:
+        return f"Address({self.as_hex!r})"
+
+    def __str__(self) -> str:
+        return self.as_hex
+
+
+def default_value(tp):
+    """Zero value of a storage type, as GenVM gives to fresh storage slots"""
+    origin = typing.get_origin(tp)
+    if isinstance(tp, type) and issubclass(tp, (TreeMap, DynArray)):
+        return tp()
+    if origin is list:
+        return DynArray[typing.get_args(tp)[0]]()
+    if origin is dict:
+        key_type, value_type = typing.get_args(tp)
+        return TreeMap[key_type, value_type]()
+    if tp is Address:
+        return Address(bytes(20))
+    if dataclasses.is_dataclass(tp):
+        return tp(**{field.name: default_value(field.type) for field in dataclasses.fields(tp)})
+    if tp in (int, str, bool, float, bytes) or tp in INT_TYPES:
+        return tp()
+    raise TypeError(f"{tp!r} is not a storage type")
+
+
+def _array_item_type(tp):
+    if typing.get_origin(tp) is list:
+        return typing.get_args(tp)[0]
+    if isinstance(tp, type) and issubclass(tp, DynArray):
+        return tp.item_type
+    return None
+
+
+def _map_types(tp) -> tuple:
+    if typing.get_origin(tp) is dict:
+        return typing.get_args(tp)
+    if isinstance(tp, type) and issubclass(tp, TreeMap):
+        return tp.key_type, tp.value_type
+    return None, None
+
+
+def to_storage(value, tp=None):
+    """Convert a value written into storage to its declared type `tp` (when known)"""
+    # Sized integers are range checked as GenVM checks them, so underflows and overflows raise
+    if tp in INT_TYPES:
+        if type(value) is tp:
+            return value
+        if not isinstance(value, int):
+            raise TypeError(f"Cannot store {type(value).__name__} as {tp.__name__}")
+        return tp(value)
+    # Plain lists and dicts become journaled containers that check their own items
+    if isinstance(value, list) and not isinstance(value, DynArray):
+        item_type = _array_item_type(tp)
+        array = DynArray[item_type]() if item_type is not None else DynArray()
+        list.extend(array, [to_storage(item, item_type) for item in value])
+        return array
+    if isinstance(value, dict):
+        key_type, value_type = _map_types(tp)
+        tree = TreeMap[key_type, value_type]() if value_type is not None else TreeMap()
+        for key, item in value.items():
+            tree[key] = item
+        return tree
+    return value
+
+
+class TreeMap(MutableMapping):
+    """Mapping that iterates in key order, like GenLayer's storage TreeMap"""
+
+    key_type = None
+    value_type = None
+    _specializations: typing.Dict[tuple, type] = {}
+
+    def __class_getitem__(cls, params):
+        if params not in TreeMap._specializations:
+            key_type, value_type = params
+            TreeMap._specializations[params] = type(
+                f"TreeMap[{getattr(key_type, '__name__', key_type)}, {getattr(value_type, '__name__', value_type)}]",
+                (TreeMap,),
+                {"key_type": key_type, "value_type": value_type},
+            )
+        return TreeMap._specializations[params]
+
+    def __init__(self):
+        self._items = {}
+        self._keys = []  # Sorted
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __setitem__(self, key, value):
+        key = to_storage(key, self.key_type)
+        value = to_storage(value, self.value_type)
+        if _access_counter is not None:
+            _access_counter.write(key, value)
+        if key in self._items:
+            old = self._items[key]
+            _record(lambda: self._items.__setitem__(key, old))
+        else:
+            bisect.insort(self._keys, key)
+            _record(lambda: self._raw_delete(key))
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        old = self._items[key]
+        if _access_counter is not None:
+            _access_counter.write(key)
+        self._raw_delete(key)
+        _record(lambda: self._raw_insert(key, old))
+
+    def _raw_delete(self, key):
+        del self._items[key]
+        del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def _raw_insert(self, key, value):
+        bisect.insort(self._keys, key)
+        self._items[key] = value
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        return f"TreeMap({{{', '.join(f'{key!r}: {self._items[key]!r}' for key in self._keys)}}})"
+
+    def get_or_insert_default(self, key):
+        if _access_counter is not None:
+            _access_counter.read(self._items.get(key))
+        if key not in self._items:
+            if self.value_type is None:
+                raise TypeError("get_or_insert_default needs a TreeMap[K, V] with a known value type")
+            self[key] = default_value(self.value_type)
+        return self._items[key]
+
+
+class DynArray(list):
+    """Growable storage array; a list whose mutations are journaled"""
+
+    item_type = None
+    _specializations: typing.Dict[typing.Any, type] = {}
+
+    def __class_getitem__(cls, item_type):
+        if item_type not in DynArray._specializations:
+            DynArray._specializations[item_type] = type(
+                f"DynArray[{getattr(item_type, '__name__', item_type)}]", (DynArray,), {"item_type": item_type}
+            )
+        return DynArray._specializations[item_type]
+
+    def _snapshot(self) -> None:
+        # Bulk operations are counted as rewriting the whole array
+        if _access_counter is not None:
+            _access_counter.write(self)
+        if _journal is not None:
+            old = list.copy(self)
+            _record(lambda: list.__setitem__(self, slice(None), old))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, int):
+            if _access_counter is not None:
+                _access_counter.write(value)
+            old = list.__getitem__(self, index)
+            _record(lambda: list.__setitem__(self, index, old))
+            list.__setitem__(self, index, to_storage(value, self.item_type))
+        else:
+            self._snapshot()
+            list.__setitem__(self, index, [to_storage(item, self.item_type) for item in value])
+
+    def __delitem__(self, index):
+        self._snapshot()
+        list.__delitem__(self, index)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def append(self, value):
+        value = to_storage(value, self.item_type)
+        if _access_counter is not None:
+            _access_counter.write(value)
+        list.append(self, value)
+        _record(lambda: list.pop(self))
+
+    def pop(self, index=-1):
+        if index == -1:
+            if _access_counter is not None:
+                _access_counter.write(list.__len__(self))
+            value = list.pop(self)
+            _record(lambda: list.append(self, value))
+            return value
+        self._snapshot()
+        return list.pop(self, index)
+
+    def extend(self, values):
+        self._snapshot()
+        list.extend(self, [to_storage(value, self.item_type) for value in values])
+
+    def insert(self, index, value):
+        self._snapshot()
+        list.insert(self, index, to_storage(value, self.item_type))
+
+    def remove(self, value):
+        self._snapshot()
+        list.remove(self, value)
+
+    def clear(self):
+        self._snapshot()
+        list.clear(self)
+
+    def sort(self, *args, **kwargs):
+        self._snapshot()
+        list.sort(self, *args, **kwargs)
+
+    def reverse(self):
+        self._snapshot()
+        list.reverse(self)
+
+
+_field_types: typing.Dict[type, dict] = {}
+
+
+def _declared_type(cls: type, name: str):
+    """Annotated type of a storage field, or None for attributes that are not fields"""
+    if cls not in _field_types:
+        annotations = {}
+        for klass in reversed(cls.__mro__):
+            annotations.update(vars(klass).get("__annotations__", {}))
+        _field_types[cls] = annotations
+    return _field_types[cls].get(name)
+
+
+def _storage_setattr(self, name, value):
+    value = to_storage(value, _declared_type(type(self), name))
+    # Fields set while a new object is constructed are counted when it is written into storage
+    if _access_counter is not None and name in self.__dict__:
+        _access_counter.write(value)
+    if _journal is not None:
+        if name in self.__dict__:
+            old = self.__dict__[name]
+            _record(lambda: object.__setattr__(self, name, old))
+        else:
+            _record(lambda: object.__delattr__(self, name))
+    object.__setattr__(self, name, value)
+
+
+def allow_storage(cls: type) -> type:
+    """Make a dataclass storable: list fields become DynArrays and field writes are journaled"""
+    cls.__setattr__ = _storage_setattr
+    storage_classes.append(cls)
+    if _access_counter is not None:
+        _access_counter.track(cls)
+    return cls
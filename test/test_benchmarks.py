@@ -0,0 +1,35 @@
+from benchmarks.run import compare, scaling_exponent
+
+
+def test_scaling_exponent():
+    """Test that constant and linear curves are told apart"""
+    assert abs(scaling_exponent({10: 0.001, 1000: 0.001})) < 0.01
+    assert abs(scaling_exponent({10: 0.001, 100: 0.01, 1000: 0.1}) - 1) < 0.01
+
+
+def test_compare_flags_regressions():
+    """Test that slowdowns and steeper scaling are flagged against the baseline"""
+    baseline = {"place_bet": {"parameter": "users", "seconds": {"10": 0.001, "1000": 0.001}, "exponent": 0.0}}
+
+    steady = {"place_bet": {"parameter": "users", "seconds": {"10": 0.0011, "1000": 0.0012}, "exponent": 0.04}}
+    assert compare(steady, baseline, tolerance=0.5, slope_tolerance=0.3) == []
+
+    linear = {"place_bet": {"parameter": "users", "seconds": {"10": 0.001, "1000": 0.1}, "exponent": 1.0}}
+    regressions = compare(linear, baseline, tolerance=0.5, slope_tolerance=0.3)
+    assert len(regressions) == 2
+    assert "users=1000" in regressions[0]
+
+
+def test_compare_ignores_timings_by_default():
+    """Test that a uniformly slower machine only fails the opt-in timing check"""
+    baseline = {"place_bet": {"parameter": "users", "seconds": {"10": 0.001, "100": 0.001, "1000": 0.001}, "exponent": 0.0}}
+
+    slower = {"place_bet": {"parameter": "users", "seconds": {"10": 0.003, "1000": 0.003}, "exponent": 0.0}}
+    assert compare(slower, baseline, tolerance=None, slope_tolerance=0.3) == []
+    assert len(compare(slower, baseline, tolerance=0.5, slope_tolerance=0.3)) == 2
+
+    # A quick run over fewer sizes is still compared on the sizes it shares with the baseline
+    linear = {"place_bet": {"parameter": "users", "seconds": {"10": 0.001, "1000": 0.1}, "exponent": 1.0}}
+    assert compare(linear, baseline, tolerance=None, slope_tolerance=0.3) == [
+        "place_bet scales as users^1.00, baseline users^0.00"
+    ]
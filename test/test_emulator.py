@@ -0,0 +1,457 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from emulator import DEFAULT_SENDER, Address, DynArray, Emulator, TreeMap, accounting, gl, storage, u8, u256
+
+
+CONTRACTS_DIR = Path(__file__).resolve().parent.parent / "contracts"
+ALICE = Address("0x" + "aa" * 20)
+BOB = Address("0x" + "bb" * 20)
+
+
+def test_storage_types():
+    """Test TreeMap ordering, zero values and sized integers"""
+    tree = TreeMap[u256, DynArray[str]]()
+    for key in [30, 10, 20]:
+        tree.get_or_insert_default(u256(key)).append(f"item {key}")
+    assert list(tree) == [10, 20, 30]
+    assert tree[20] == ["item 20"]
+
+    del tree[10]
+    assert next(iter(tree)) == 20
+
+    with pytest.raises(OverflowError):
+        u8(256)
+    assert Address(ALICE.as_hex) == ALICE
+
+
+class Counter(gl.Contract):
+    count: u256
+    history: TreeMap[u256, Address]
+
+    def __init__(self):
+        pass
+
+    @gl.public.write
+    def bump(self, fail: bool) -> None:
+        self.count += 1
+        self.history[self.count] = gl.message.sender_address
+        if fail:
+            raise Exception("Bump failed")
+
+
+class Ledger(gl.Contract):
+    balance: u256
+    level: u8
+    amounts: TreeMap[Address, u256]
+    history: DynArray[u8]
+
+    def __init__(self):
+        pass
+
+    @gl.public.write
+    def spend(self, amount: int) -> None:
+        self.balance -= amount
+
+    @gl.public.write
+    def set_level(self, level: int) -> None:
+        self.level = level
+
+    @gl.public.write
+    def record(self, amount: int, level: int) -> None:
+        self.amounts[gl.message.sender_address] = amount
+        self.history.append(level)
+
+
+def test_storage_writes_are_type_checked():
+    """Test that writes to sized integer fields, map values and array items are range checked"""
+    emulator = Emulator()
+    ledger = emulator.deploy(Ledger)
+
+    with pytest.raises(OverflowError):
+        emulator.call(ledger, "spend", 1)
+    with pytest.raises(OverflowError):
+        emulator.call(ledger, "set_level", 1000)
+    with pytest.raises(OverflowError):
+        emulator.call(ledger, "record", -1, 0)
+    with pytest.raises(OverflowError):
+        emulator.call(ledger, "record", 1, 256)
+
+    emulator.call(ledger, "record", 5, 7)
+    assert type(ledger.amounts[DEFAULT_SENDER]) is u256
+    assert type(ledger.history[0]) is u8
+    assert (ledger.balance, ledger.level) == (0, 0)
+
+
+def test_failed_transaction_rolls_back():
+    """Test that a reverted call leaves storage as it was"""
+    emulator = Emulator()
+    counter = emulator.deploy(Counter)
+    emulator.call(counter, "bump", False, sender=ALICE)
+
+    with pytest.raises(Exception, match="Bump failed"):
+        emulator.call(counter, "bump", True, sender=BOB)
+    assert counter.count == 1
+    assert dict(counter.history) == {1: ALICE}
+
+
+def test_market_resolution_with_stubs():
+    """Test resolving and claiming a market with stubbed web and AI calls"""
+    pages = []
+
+    def webpage_handler(url: str, mode: str) -> str:
+        pages.append(url)
+        return "Final: the home side won 2-1"
+
+    emulator = Emulator(
+        prompt_handler=lambda prompt: json.dumps({"resolved_outcome_id": "outcome_2"}),
+        webpage_handler=webpage_handler,
+        sender=ALICE,
+    )
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    market_id = emulator.call(
+        contract, "create_market",
+        "Who wins the derby?", "Derby market", "sports", "2025-12-31", "https://scores.example", ["Away", "Home"],
+        "0.01", "claim",
+    )
+    emulator.call(contract, "place_bet", market_id, "outcome_1", sender=ALICE, value=1000000000000000000)
+    emulator.call(contract, "place_bet", market_id, "outcome_2", sender=BOB, value=1000000000000000000)
+
+    emulator.call(contract, "resolve_market", market_id, sender=ALICE)
+    assert pages == ["https://scores.example"]
+    assert emulator.call(contract, "claim_winnings", market_id, sender=BOB) == "2000000000000000000"
+
+
+def test_football_fixture_resolution():
+    """Test settling a whole fixture with one match check"""
+    prompts = []
+
+    def prompt_handler(prompt: str) -> str:
+        prompts.append(prompt)
+        return json.dumps({"score": "2:0", "winner": 1})
+
+    emulator = Emulator(prompt_handler=prompt_handler, webpage_handler=lambda url, mode: "Germany 2 Scotland 0")
+    contract = emulator.deploy(CONTRACTS_DIR / "football_bets.py")
+    emulator.call(contract, "create_bet", "2024-06-14", "Germany", "Scotland", "1", sender=ALICE)
+    emulator.call(contract, "create_bet", "2024-06-14", "Germany", "Scotland", "2", sender=BOB)
+
+    assert emulator.call(contract, "resolve_fixture", "2024-06-14", "Germany", "Scotland") == 2
+    assert len(prompts) == 1
+    assert emulator.call(contract, "get_leaderboard") == [{"rank": 1, "address": ALICE.as_hex, "points": 1}]
+
+
+def test_storage_accounting():
+    """Test that storage reads, writes and bytes are counted per public method"""
+    emulator = Emulator()
+    counter = emulator.deploy(Counter)
+    already_enabled = storage._access_counter is not None  # Under pytest --storage-report
+
+    with accounting.measure() as stats:
+        emulator.call(counter, "bump", False, sender=ALICE)
+        with pytest.raises(Exception, match="Bump failed"):
+            emulator.call(counter, "bump", True, sender=BOB)
+        emulator.call(counter, "bump", False, sender=ALICE)
+
+    bump = stats.methods["Counter.bump"]
+    assert (bump.calls, bump.failures) == (3, 1)
+    # count read twice, history loaded once; count and one history entry written
+    assert bump.reads == 3 * 3
+    assert bump.writes == 3 * 2
+    assert bump.bytes_written == 3 * (32 + 32 + 20)
+    assert stats.as_dict()["Counter.bump"]["writes"] == 2
+
+    # The read hooks are removed once measuring ends, unless accounting was on before
+    if not already_enabled:
+        assert "__getattribute__" not in vars(Counter)
+        assert TreeMap.__getitem__ is not accounting._counting_treemap_getitem
+
+
+def test_nested_storage_accounting():
+    """Test that a measurement inside an enabled accounting gets its own totals and keeps the outer one counting"""
+    emulator = Emulator()
+    counter = emulator.deploy(Counter)
+    outer = accounting.enable() if storage._access_counter is None else None
+    try:
+        session = storage._access_counter
+        calls_before = session.methods["Counter.bump"].calls if "Counter.bump" in session.methods else 0
+        with accounting.measure() as stats:
+            emulator.call(counter, "bump", False)
+        emulator.call(counter, "bump", False)
+
+        assert stats.methods["Counter.bump"].calls == 1
+        assert stats.methods["Counter.bump"].writes == 2
+        # The enclosing accounting saw both calls and is still the active one
+        assert session.methods["Counter.bump"].calls == calls_before + 2
+        assert storage._access_counter is session
+    finally:
+        if outer is not None:
+            accounting.disable()
+
+
+def test_batch_resolution_shares_one_fetch():
+    """Test resolving markets with a shared source from one fetch, leaving unresolvable ones active"""
+    pages = []
+    prompts = []
+
+    def webpage_handler(url: str, mode: str) -> str:
+        pages.append(url)
+        return "Derby: home side won 2-1\nCup final: postponed"
+
+    def prompt_handler(prompt: str) -> str:
+        prompts.append(prompt)
+        return json.dumps({"markets": {
+            "market_1": {"resolved_outcome_id": "outcome_2"},
+            "market_2": {"resolved_outcome_id": None},
+            "market_3": {"resolved_outcome_id": "outcome_7"},
+        }})
+
+    emulator = Emulator(prompt_handler=prompt_handler, webpage_handler=webpage_handler, sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    market_ids = [
+        emulator.call(
+            contract, "create_market",
+            title, "League market", "sports", "2025-12-31", "https://league.example/results", ["Away", "Home"],
+        )
+        for title in ["Who wins the derby?", "Who wins the cup final?", "Who wins the playoff?"]
+    ]
+
+    assert emulator.call(contract, "resolve_markets", market_ids) == ["market_1"]
+    assert pages == ["https://league.example/results"]
+    assert len(prompts) == 1
+    statuses = [emulator.call(contract, "get_market", market_id)["status"] for market_id in market_ids]
+    assert statuses == ["resolved", "active", "active"]
+
+
+def test_resolution_page_filtering():
+    """Test that only passages about the market reach the resolution prompt, within the token budget"""
+    prompts = []
+    page = "\n".join(
+        [f"Advertisement {i}: subscribe for more sports news" for i in range(200)]
+        + ["Derby result: Rovers 2 United 1"]
+        + [f"Weather update {i}: sunny spells" for i in range(200)]
+    )
+
+    def prompt_handler(prompt: str) -> str:
+        prompts.append(prompt.split("Data Source:\n", 1)[1].split("\n\nDetermine", 1)[0])
+        return json.dumps({"resolved_outcome_id": "outcome_1"})
+
+    pages = {
+        "https://scores.example": page,
+        "https://forum.example": "\n".join(f"Rovers fan post {i}: what a derby" for i in range(200)),
+        "https://other.example": "x" * 10000,
+    }
+    emulator = Emulator(prompt_handler=prompt_handler, webpage_handler=lambda url, mode: pages[url], sender=ALICE)
+    # A 100-token budget keeps about 400 characters of each page
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py", 50, 100)
+    for source in pages:
+        market_id = emulator.call(
+            contract, "create_market",
+            "Rovers vs United derby", "Derby market", "sports", "2025-12-31", source, ["Rovers", "United"],
+        )
+        emulator.call(contract, "resolve_market", market_id)
+
+    relevant, forum, fallback = prompts
+    assert "Derby result: Rovers 2 United 1" in relevant
+    # The match keeps two neighbouring lines on each side for context; the rest of the page is dropped
+    assert len(relevant.splitlines()) == 5
+    assert "Advertisement 0:" not in relevant and "Weather update 199:" not in relevant
+    # Matches are kept only while they fit in the budget
+    assert 300 < len(forum) <= 400
+    # A page with no match falls back to its beginning
+    assert fallback == "x" * 400
+
+
+def test_filled_order_closes_position():
+    """Test that selling a whole position through the order book leaves no empty position behind"""
+    emulator = Emulator(sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    market_id = emulator.call(
+        contract, "create_market",
+        "Will it rain in Bergen tomorrow?", "Weather market", "other", "2025-12-31", "https://weather.com", ["Yes", "No"],
+    )
+    emulator.call(contract, "place_bet", market_id, "outcome_1", value=1000000000000000000)
+    shares = emulator.call(contract, "get_user_positions")[0]["shares"]
+    with pytest.raises(Exception, match="Shares must be positive"):
+        emulator.call(contract, "place_limit_order", market_id, "outcome_1", "-1", "400000000000000000")
+    with pytest.raises(Exception, match="Price must be between"):
+        emulator.call(contract, "place_limit_order", market_id, "outcome_1", shares, "-400000000000000000")
+    order_id = emulator.call(contract, "place_limit_order", market_id, "outcome_1", shares, "400000000000000000")
+    assert emulator.call(contract, "get_user_positions") == []
+
+    # Cancelling reopens the position with its shares
+    emulator.call(contract, "cancel_order", order_id)
+    assert emulator.call(contract, "get_user_positions")[0]["shares"] == shares
+    emulator.call(contract, "place_limit_order", market_id, "outcome_1", shares, "400000000000000000")
+
+    emulator.call(contract, "place_bet", market_id, "outcome_1", sender=BOB, value=800000000000000000)
+    assert emulator.call(contract, "get_order_book", market_id, "outcome_1") == []
+    assert emulator.call(contract, "get_user_positions") == []
+    assert [position["shares"] for position in emulator.call(contract, "get_user_positions", BOB.as_hex)] == [shares]
+
+
+def test_sale_keeps_other_stakes():
+    """Test that buying and selling back cannot take another bettor's stake"""
+    emulator = Emulator(prompt_handler=lambda prompt: json.dumps({"resolved_outcome_id": "outcome_2"}), sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    market_id = emulator.call(
+        contract, "create_market",
+        "Will it rain in Porto tomorrow?", "Weather market", "other", "2025-12-31", "Porto: rain", ["Yes", "No"],
+    )
+    emulator.call(contract, "place_bet", market_id, "outcome_2", sender=ALICE, value=1000000000000000000)
+
+    # BOB buys 10 shares at 0.1 ETH; the price then rises to 0.5 ETH, but a sale only returns the stake basis
+    emulator.call(contract, "place_bet", market_id, "outcome_1", sender=BOB, value=1000000000000000000)
+    emulator.call(contract, "place_bet", market_id, "outcome_1", sender=BOB, value=1000000000000000000)
+    shares = emulator.call(contract, "get_user_positions", BOB.as_hex)[0]["shares"]
+    with pytest.raises(Exception, match="Shares must be positive"):
+        emulator.call(contract, "sell_shares", market_id, "outcome_1", "-" + shares, sender=BOB)
+    assert emulator.call(contract, "sell_shares", market_id, "outcome_1", shares, sender=BOB) == "2000000000000000000"
+    assert emulator.call(contract, "get_market", market_id)["pot"] == "1000000000000000000"
+
+    emulator.call(contract, "resolve_market", market_id)
+    assert emulator.call(contract, "get_user_balance", ALICE.as_hex) == "1000000000000000000"
+
+
+def test_portfolio_cursor_survives_closed_positions():
+    """Test that closing a position between portfolio pages does not skip later positions"""
+    emulator = Emulator(sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    market_ids = [
+        emulator.call(
+            contract, "create_market",
+            f"Will it rain in Faro on day {i + 1}?", "Weather market", "other", "2025-12-31", "https://weather.com", ["Yes", "No"],
+        )
+        for i in range(4)
+    ]
+    for market_id in market_ids:
+        emulator.call(contract, "place_bet", market_id, "outcome_1", value=1000000000000000000)
+
+    first_page = emulator.call(contract, "get_portfolio", "", "", 0, 2)
+    assert [position["market_id"] for position in first_page["positions"]] == market_ids[:2]
+
+    # Close the first and the cursor position
+    for position in first_page["positions"]:
+        emulator.call(contract, "sell_shares", position["market_id"], "outcome_1", position["shares"])
+
+    second_page = emulator.call(contract, "get_portfolio", "", "", first_page["next_cursor"], 2)
+    assert [position["market_id"] for position in second_page["positions"]] == market_ids[2:]
+    assert second_page["next_cursor"] == -1
+
+
+def test_match_result_cache(monkeypatch):
+    """Test that finished results are reused and unfinished ones are only rechecked after the retry delay"""
+    answers = [{"score": "-", "winner": -1}, {"score": "2:0", "winner": 1}]
+    prompts = []
+    pages = []
+
+    def prompt_handler(prompt: str) -> str:
+        prompts.append(prompt)
+        return json.dumps(answers[min(len(prompts), len(answers)) - 1])
+
+    def webpage_handler(url: str, mode: str) -> str:
+        pages.append(url)
+        return "Germany v Scotland"
+
+    emulator = Emulator(prompt_handler=prompt_handler, webpage_handler=webpage_handler)
+    contract = emulator.deploy(CONTRACTS_DIR / "football_bets.py")
+    now = [1000000]
+    monkeypatch.setattr(type(contract), "_now", lambda self: now[0])
+    bet_id = "2024-06-14_germany_scotland"
+    for sender in [ALICE, BOB]:
+        emulator.call(contract, "create_bet", "2024-06-14", "Germany", "Scotland", "1", sender=sender)
+
+    # An unfinished match is reported without raising and is not checked again within the retry delay
+    assert emulator.call(contract, "resolve_bet", bet_id, sender=ALICE) is False
+    now[0] += 30 * 60 - 1
+    assert emulator.call(contract, "resolve_bet", bet_id, sender=BOB) is False
+    assert len(prompts) == len(pages) == 1
+
+    now[0] += 1
+    assert emulator.call(contract, "resolve_bet", bet_id, sender=ALICE) is True
+    assert len(prompts) == len(pages) == 2
+
+    # The finished result is final, so settling the other bet needs no web or LLM call
+    assert emulator.call(contract, "resolve_bet", bet_id, sender=BOB) is True
+    assert len(prompts) == len(pages) == 2
+    assert emulator.call(contract, "get_player_points", BOB.as_hex) == 1
+
+
+def test_market_pagination_stable_cursor():
+    """Test that markets leaving a filter between pages do not shift later pages"""
+    emulator = Emulator(prompt_handler=lambda prompt: json.dumps({"resolved_outcome_id": "outcome_1"}), sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    for i in range(5):
+        emulator.call(
+            contract, "create_market",
+            f"Will it snow in Oslo on day {i + 1}?", "Weather market", "other", "2025-12-31", "Oslo: snow", ["Yes", "No"],
+        )
+
+    def page(cursor: int) -> list:
+        return [market["id"] for market in emulator.call(contract, "get_markets", "", "active", cursor, 2)]
+
+    assert page(0) == ["market_1", "market_2"]
+
+    # The cursor is the number of the last market seen
+    emulator.call(contract, "resolve_market", "market_1")
+    assert page(2) == ["market_3", "market_4"]
+
+    # Removing the cursor market itself keeps the place too
+    emulator.call(contract, "resolve_market", "market_4")
+    assert page(4) == ["market_5"]
+    assert emulator.call(contract, "get_market_count", "", "active") == 3
+
+
+def test_trending_refills_after_resolution():
+    """Test that resolving a market on the trending board moves the next market by volume up"""
+    emulator = Emulator(prompt_handler=lambda prompt: json.dumps({"resolved_outcome_id": "outcome_1"}), sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py", 3)
+    market_ids = []
+    for i in range(6):
+        market_id = emulator.call(
+            contract, "create_market",
+            f"Will it rain in Bilbao on day {i + 1}?", "Weather market", "other", "2025-12-31", "Bilbao: rain", ["Yes", "No"],
+        )
+        emulator.call(contract, "place_bet", market_id, "outcome_1", value=(i + 1) * 1000000000000000000)
+        market_ids.append(market_id)
+
+    def trending() -> list:
+        return [market["id"] for market in emulator.call(contract, "get_trending_markets", 10)]
+
+    assert trending() == ["market_6", "market_5", "market_4"]
+
+    for market_id in ["market_6", "market_5"]:
+        emulator.call(contract, "resolve_market", market_id)
+    emulator.call(contract, "place_bet", "market_1", "outcome_1", value=100000000000000000)
+    assert trending() == ["market_4", "market_3", "market_2"]
+
+
+def test_order_fills_are_bounded_and_settle_after_resolution():
+    """Test order value and fill limits, fill volume, and settling orders left on a resolved market"""
+    emulator = Emulator(prompt_handler=lambda prompt: json.dumps({"resolved_outcome_id": "outcome_1"}), sender=ALICE)
+    contract = emulator.deploy(CONTRACTS_DIR / "prediction_market.py")
+    market_id = emulator.call(
+        contract, "create_market",
+        "Will it rain in Split tomorrow?", "Weather market", "other", "2025-12-31", "Split: rain", ["Yes", "No"],
+        "0.01", "claim",
+    )
+    emulator.call(contract, "place_bet", market_id, "outcome_1", value=1000000000000000000)
+    with pytest.raises(Exception, match="Minimum order value"):
+        emulator.call(contract, "place_limit_order", market_id, "outcome_1", "1000000000000000", "400000000000000000")
+
+    # 25 orders of 0.06 shares at 0.2 ETH; a bet fills 20 of them and buys the rest from the AMM
+    order_ids = [
+        emulator.call(contract, "place_limit_order", market_id, "outcome_1", "60000000000000000", "200000000000000000")
+        for _ in range(25)
+    ]
+    emulator.call(contract, "place_bet", market_id, "outcome_1", sender=BOB, value=1000000000000000000)
+    assert emulator.call(contract, "get_order_book", market_id, "outcome_1")[0]["orders"] == 5
+    assert emulator.call(contract, "get_market", market_id)["total_volume"] == "2000000000000000000"
+    assert emulator.call(contract, "get_user_balance", ALICE.as_hex) == "240000000000000000"
+
+    # Resolution leaves the orders in place; cancelling one pays out its escrowed stake basis
+    emulator.call(contract, "resolve_market", market_id)
+    assert emulator.call(contract, "get_order_book", market_id, "outcome_1")[0]["orders"] == 5
+    emulator.call(contract, "cancel_order", order_ids[-1])
+    assert emulator.call(contract, "get_user_balance", ALICE.as_hex) == "270000000000000000"
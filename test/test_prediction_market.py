@@ -114,3 +114,401 @@ def test_multiple_categories():
     sports_markets = contract.get_markets(args=["sports"])
     assert len(sports_markets) == 1
     assert sports_markets[0]["category"] == "sports"
+
+
+def test_cpmm_market_pricing():
+    """Test integer constant-product pricing on a cpmm market"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=[
+            "Will BTC close above $100k in 2025?",
+            "Bitcoin year-end closing price market",
+            "crypto",
+            "2025-12-31",
+            "https://coinmarketcap.com/currencies/bitcoin/",
+            ["Yes", "No"],
+            "0.01",
+            "push",
+            "cpmm",
+            "1"
+        ]
+    )
+    
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    # Equal pools price both outcomes at 0.5 ETH
+    market = contract.get_market(args=[market_id])
+    assert market["pricing_model"] == "cpmm"
+    assert [outcome["share_price"] for outcome in market["outcomes"]] == [
+        "500000000000000000",
+        "500000000000000000",
+    ]
+    
+    bet_result = contract.place_bet(
+        args=[market_id, "outcome_1"],
+        value=1000000000000000000  # 1 ETH in wei
+    )
+    assert tx_execution_succeeded(bet_result)
+    
+    # Buying "Yes" moves its price up, and prices still sum to 1 ETH
+    market = contract.get_market(args=[market_id])
+    prices = [int(outcome["share_price"]) for outcome in market["outcomes"]]
+    assert prices == [800000000000000000, 200000000000000000]
+    
+    positions = contract.get_user_positions(args=[])
+    assert positions[0]["shares"] == "1500000000000000000"
+
+
+def test_market_pagination():
+    """Test paging through filtered markets with cursor and limit"""
+    contract = load_fixture(deploy_contract)
+    
+    for i in range(3):
+        result = contract.create_market(
+            args=[
+                f"Fed Rate Decision {i+1}",
+                "Will the Fed change interest rates?",
+                "economics",
+                "2025-12-31",
+                "https://www.federalreserve.gov/",
+                ["Increase", "Decrease", "No Change"],
+                "0.01"
+            ]
+        )
+        assert tx_execution_succeeded(result)
+    
+    assert contract.get_market_count(args=["economics", "active"]) == 3
+    
+    first_page = contract.get_markets(args=["economics", "active", 0, 2])
+    assert [market["id"] for market in first_page] == ["market_1", "market_2"]
+    
+    second_page = contract.get_markets(args=["economics", "active", 2, 2])
+    assert [market["id"] for market in second_page] == ["market_3"]
+    
+    assert contract.get_markets(args=["sports", "active", 0, 2]) == []
+
+
+def test_trending_markets():
+    """Test the volume-ranked trending leaderboard"""
+    contract = load_fixture(deploy_contract)
+    
+    market_ids = []
+    for category in ["sports", "crypto"]:
+        result = contract.create_market(
+            args=[
+                f"Trending {category} market",
+                f"A {category} prediction market",
+                category,
+                "2025-12-31",
+                f"https://example.com/{category}",
+                ["Yes", "No"],
+                "0.01"
+            ]
+        )
+        assert tx_execution_succeeded(result)
+        market_ids.append(result.return_value)
+    
+    bet_result = contract.place_bet(
+        args=[market_ids[1], "outcome_1"],
+        value=1000000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    
+    trending = contract.get_trending_markets(args=[])
+    assert [market["id"] for market in trending] == [market_ids[1], market_ids[0]]
+    
+    top_sports = contract.get_trending_markets(args=[1, "sports"])
+    assert [market["id"] for market in top_sports] == [market_ids[0]]
+
+
+def test_place_bets_batch():
+    """Test placing several bets in one transaction"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=[
+            "Champions League Winner",
+            "Which club will win the Champions League?",
+            "sports",
+            "2026-05-30",
+            "https://www.uefa.com/uefachampionsleague/",
+            ["Real Madrid", "Man City", "Other"],
+            "0.01"
+        ]
+    )
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    bet_result = contract.place_bets(
+        args=[[
+            {"market_id": market_id, "outcome_id": "outcome_1", "amount": "600000000000000000"},
+            {"market_id": market_id, "outcome_id": "outcome_2", "amount": "400000000000000000"},
+        ]],
+        value=1000000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    
+    market = contract.get_market(args=[market_id])
+    assert market["total_volume"] == "1000000000000000000"
+    
+    positions = contract.get_user_positions(args=[])
+    assert sorted(position["outcome_id"] for position in positions) == ["outcome_1", "outcome_2"]
+
+
+def test_deferred_market_analysis():
+    """Test that sentiment analysis runs after market creation"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=[
+            "Best Picture 2026",
+            "Which film will win Best Picture at the 2026 Oscars?",
+            "entertainment",
+            "2026-03-15",
+            "https://www.oscars.org/",
+            ["Favorite", "Other"],
+            "0.01"
+        ]
+    )
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    market = contract.get_market(args=[market_id])
+    assert market["analysis_status"] == "pending"
+    assert market["analysis"] == ""
+    
+    analyze_result = contract.analyze_pending(args=[5])
+    assert tx_execution_succeeded(analyze_result)
+    
+    market = contract.get_market(args=[market_id])
+    assert market["analysis_status"] == "complete"
+
+
+def test_sentiment_cache():
+    """Test that an equivalent market reuses a cached analysis and a different one does not"""
+    contract = load_fixture(deploy_contract)
+    
+    def create(title):
+        result = contract.create_market(
+            args=[title, "Bitcoin price market", "crypto", "2025-12-31", "https://coinmarketcap.com/", ["Yes", "No"], "0.01"]
+        )
+        assert tx_execution_succeeded(result)
+        return result.return_value
+    
+    create("Will BTC close above $50k by 2025?")
+    analyze_result = contract.analyze_pending(args=[5])
+    assert tx_execution_succeeded(analyze_result)
+    
+    # Differing only in case and punctuation, the market is analyzed from the cache without a prompt
+    market_id = create("will btc close above 50k by 2025")
+    assert contract.get_market(args=[market_id])["analysis_status"] == "complete"
+    
+    market_id = create("Will BTC close above $150k by 2030?")
+    assert contract.get_market(args=[market_id])["analysis_status"] == "pending"
+
+
+def test_portfolio_pagination():
+    """Test paging through a user's positions with mark-to-market values"""
+    contract = load_fixture(deploy_contract)
+    
+    market_ids = []
+    for i in range(2):
+        result = contract.create_market(
+            args=[
+                f"ETH above $5k by Q{i+1}?",
+                "Ethereum quarterly price market",
+                "crypto",
+                "2025-12-31",
+                "https://coinmarketcap.com/currencies/ethereum/",
+                ["Yes", "No"],
+                "0.01",
+                "push",
+                "cpmm",
+                "1"
+            ]
+        )
+        assert tx_execution_succeeded(result)
+        market_ids.append(result.return_value)
+    
+    for market_id in market_ids:
+        bet_result = contract.place_bet(
+            args=[market_id, "outcome_1"],
+            value=1000000000000000000
+        )
+        assert tx_execution_succeeded(bet_result)
+    
+    first_page = contract.get_portfolio(args=["", "active", 0, 1])
+    assert [position["market_id"] for position in first_page["positions"]] == [market_ids[0]]
+    assert first_page["next_cursor"] != -1
+    
+    # 1.5 shares marked at 0.8 ETH
+    assert first_page["positions"][0]["current_value"] == "1200000000000000000"
+    
+    second_page = contract.get_portfolio(args=["", "active", first_page["next_cursor"], 1])
+    assert [position["market_id"] for position in second_page["positions"]] == [market_ids[1]]
+    assert second_page["next_cursor"] == -1
+
+
+def test_market_summaries():
+    """Test projecting only the requested market columns"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=[
+            "Will it snow in London on Christmas?",
+            "White Christmas market",
+            "other",
+            "2025-12-25",
+            "https://www.metoffice.gov.uk/",
+            ["Yes", "No"],
+            "0.01"
+        ]
+    )
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    summaries = contract.get_market_summaries(args=[[market_id], ["id", "status", "outcome_count"]])
+    assert summaries == [{"id": market_id, "status": "active", "outcome_count": 2}]
+    
+    # Without ids, a page of the category/status filter is projected with the default columns
+    summaries = contract.get_market_summaries(args=[[], [], "other", "active"])
+    assert [summary["title"] for summary in summaries] == ["Will it snow in London on Christmas?"]
+    assert "description" not in summaries[0]
+
+
+def test_changes_since():
+    """Test incremental sync from the versioned change feed"""
+    contract = load_fixture(deploy_contract)
+    
+    market_ids = []
+    for title in ["Will it rain in Paris tomorrow?", "Will it rain in Rome tomorrow?"]:
+        result = contract.create_market(
+            args=[title, "Weather market", "other", "2025-12-31", "https://weather.com", ["Yes", "No"], "0.01"]
+        )
+        assert tx_execution_succeeded(result)
+        market_ids.append(result.return_value)
+    
+    changes = contract.get_changes_since(args=[0])
+    assert [market["id"] for market in changes["markets"]] == market_ids
+    assert changes["reset"] is False
+    assert changes["has_more"] is False
+    synced_version = changes["version"]
+    
+    bet_result = contract.place_bet(
+        args=[market_ids[0], "outcome_1"],
+        value=1000000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    
+    # Only the market touched since the last sync is returned
+    changes = contract.get_changes_since(args=[synced_version])
+    assert [market["id"] for market in changes["markets"]] == [market_ids[0]]
+    assert changes["markets"][0]["total_volume"] == "1000000000000000000"
+    assert changes["version"] == synced_version + 1
+    
+    # A version this contract never reached, e.g. saved before a redeploy, forces a reload
+    changes = contract.get_changes_since(args=[synced_version + 100])
+    assert changes["reset"] is True
+    assert changes["version"] == synced_version + 1
+
+
+def test_price_candles():
+    """Test OHLC candles recorded by bets"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=["Will it rain in Oslo tomorrow?", "Weather market", "other", "2025-12-31", "https://weather.com", ["Yes", "No"], "0.01"]
+    )
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    assert contract.get_price_candles(args=[market_id, "outcome_1"]) == []
+    
+    bet_result = contract.place_bet(
+        args=[market_id, "outcome_1"],
+        value=1000000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    
+    candles = contract.get_price_candles(args=[market_id, "outcome_1", "1h", 24])
+    assert len(candles) == 1
+    assert candles[0]["open"] == "500000000000000000"
+    assert candles[0]["close"] == "900000000000000000"
+    assert candles[0]["volume"] == "1000000000000000000"
+    
+    # The other outcome is charted too, without volume
+    candles = contract.get_price_candles(args=[market_id, "outcome_2", "1d", 24])
+    assert candles[0]["close"] == "100000000000000000"
+    assert candles[0]["volume"] == "0"
+
+
+def test_limit_orders():
+    """Test bets filling resting sell orders before the AMM"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=["Will it rain in Madrid tomorrow?", "Weather market", "other", "2025-12-31", "https://weather.com", ["Yes", "No"], "0.01"]
+    )
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    # 1 ETH at the initial 0.5 ETH price buys 2 shares
+    bet_result = contract.place_bet(
+        args=[market_id, "outcome_1"],
+        value=1000000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    
+    order_result = contract.place_limit_order(
+        args=[market_id, "outcome_1", "1000000000000000000", "400000000000000000"]
+    )
+    assert tx_execution_succeeded(order_result)
+    assert contract.get_order_book(args=[market_id, "outcome_1"]) == [
+        {"price": "400000000000000000", "shares": "1000000000000000000", "orders": 1}
+    ]
+    
+    # The order is cheaper than the AMM price of 0.9 ETH, so the bet fills it
+    bet_result = contract.place_bet(
+        args=[market_id, "outcome_1"],
+        value=200000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    book = contract.get_order_book(args=[market_id, "outcome_1"])
+    assert book[0]["shares"] == "500000000000000000"
+    assert contract.get_user_balance(args=[]) == "200000000000000000"
+    
+    cancel_result = contract.cancel_order(args=[order_result.return_value])
+    assert tx_execution_succeeded(cancel_result)
+    assert contract.get_order_book(args=[market_id, "outcome_1"]) == []
+
+
+def test_sell_shares():
+    """Test selling a position back to the market maker"""
+    contract = load_fixture(deploy_contract)
+    
+    result = contract.create_market(
+        args=["Will it rain in Lisbon tomorrow?", "Weather market", "other", "2025-12-31", "https://weather.com", ["Yes", "No"], "0.01", "push", "cpmm", "1"]
+    )
+    assert tx_execution_succeeded(result)
+    market_id = result.return_value
+    
+    bet_result = contract.place_bet(
+        args=[market_id, "outcome_1"],
+        value=1000000000000000000
+    )
+    assert tx_execution_succeeded(bet_result)
+    shares = contract.get_user_positions(args=[])[0]["shares"]
+    
+    # Selling everything straight back to the constant-product curve returns the stake
+    sell_result = contract.sell_shares(args=[market_id, "outcome_1", shares])
+    assert tx_execution_succeeded(sell_result)
+    assert sell_result.return_value == "1000000000000000000"
+    assert contract.get_user_balance(args=[]) == "1000000000000000000"
+    
+    # The closed position is removed
+    assert contract.get_user_positions(args=[]) == []
+    market = contract.get_market(args=[market_id])
+    assert market["pot"] == "0"
+    assert [outcome["total_stakes"] for outcome in market["outcomes"]] == ["0", "0"]